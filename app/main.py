@@ -6,16 +6,33 @@ import os
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from fastapi.templating import Jinja2Templates
 import logging
 
-from .routers import home, api
+from .routers import home, api, sessions
+from webchat.core.chains.registry import build_all_chains, clear_built_chains
+from webchat.core.llm import close_llm_clients
+from webchat.core.metrics import render_metrics
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Build every registered chain now instead of on the first request that uses it
+    build_all_chains()
+    yield
+    # Release the pooled keep-alive connections shared by all LLM chains; the chains
+    # built on them are dropped so the next startup builds them on a new client
+    await close_llm_clients()
+    clear_built_chains()
+
+
+app = FastAPI(lifespan=lifespan)
 
 template_path = os.path.join(
     os.path.dirname(os.path.dirname(__file__)), "app", "templates"
@@ -26,3 +43,12 @@ templates = Jinja2Templates(directory=template_path)
 # Include routers
 app.include_router(home.router)
 app.include_router(api.router, prefix="/api")
+app.include_router(sessions.router, prefix="/api/sessions")
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Span histograms and in-flight gauges in the Prometheus text format"""
+    return PlainTextResponse(
+        render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
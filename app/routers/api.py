@@ -1,4 +1,5 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Request
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import Optional, List, Dict, Any
 import json
@@ -11,13 +12,40 @@ from test_data import (
     business_info,
     combined_data,
 )
-from webchat.workflow import get_updated_page_content_openai
+from webchat.workflow import (
+    get_updated_page_content_openai,
+    stream_updated_page_content_openai,
+)
+from webchat.core.deadline import (
+    ClientDisconnected,
+    deadline_seconds,
+    run_until_disconnect,
+    start_budget,
+    stream_until_disconnect,
+)
+from webchat.core.metrics import (
+    ERROR,
+    REJECTED,
+    request_span,
+    stage_span,
+    timed_request,
+)
+from webchat.core.page_schema import apply_section_value
+from webchat.core.payload_log import log_payload
+from webchat.core.token_usage import (
+    APPLY_SELECTION_ACTION,
+    set_usage_labels,
+    token_usage,
+)
+from webchat.core.trace import TRACING, attach_trace, start_trace, traced
+from webchat.core.verdict_cache import verdict_cache
 from app.utils.content_utils import (
     convert_page_keys_for_update,
     extract_updated_page_from_response,
     identify_content_section,
 )
-from app.utils.constants import ACTION_QUESTIONS
+from app.utils.constants import ACTION_QUESTIONS, get_precomputed_verdicts
+from webchat.settings import ASK_AI_DEADLINE, ASK_AI_STREAM_DEADLINE
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
@@ -43,15 +71,21 @@ class SelectionRequest(BaseModel):
     business_info: dict
 
 
+def page_titles(site_payload):
+    """Extract page titles/names from one site's payload, whichever key it uses"""
+    pages = site_payload["pages"]
+    # Try both possible keys
+    if pages and "title" in pages[0]:
+        return [page["title"] for page in pages]
+    elif pages and "Page Name" in pages[0]:
+        return [page["Page Name"] for page in pages]
+    return []
+
+
 def get_page_titles_flexible(combined_data, element_index):
     """Extract page titles/names from either data structure"""
     if element_index < len(combined_data):
-        pages = combined_data[element_index]["pages"]
-        # Try both possible keys
-        if pages and "title" in pages[0]:
-            return [page["title"] for page in pages]
-        elif pages and "Page Name" in pages[0]:
-            return [page["Page Name"] for page in pages]
+        return page_titles(combined_data[element_index])
     return []
 
 
@@ -66,37 +100,16 @@ def apply_selection_to_content(webpage_output: dict, selection: Dict[str, Any])
 
         logger.info(f"Applying selection: {selected_output} to section: {section}")
 
-        # Create a copy of the webpage output to modify
-        updated_content = webpage_output.copy()
-
-        # Map the section to the correct field in webpage_output
-        section_mapping = {
-            "Meta Title": "Meta Title (30 to 60 Characters)",
-            "Meta Description": "Meta Description (70 to 143 Characters)",
-            "Hero Title": "Hero Title (20 to 70 Characters)",
-            "Hero Text": "Hero Text (50 to 100 Characters)",
-            "Hero CTA": "Hero CTA",
-            "H1": "H1 (30 to 70 Characters)",
-            "H1 Content": "H1 Content",
-            "Header": "Header",
-            "Leading Sentence": "Leading Sentence",
-            "CTA Button": "CTA Button",
-        }
-
-        # Get the correct field name
-        field_name = section_mapping.get(section, section)
-
-        # Apply the selected output to the content
-        if field_name in updated_content:
-            updated_content[field_name] = selected_output
-            logger.info(f"Successfully updated {field_name} with: {selected_output}")
+        # Copy-on-write: only the page and the containers along the field path are copied
+        with stage_span("apply_section_value"):
+            updated_content = apply_section_value(
+                webpage_output, section, selected_output
+            )
+        if updated_content is not None:
+            logger.info(f"Successfully updated {section} with: {selected_output}")
         else:
-            # Handle H2 sections and other complex structures
-            if section.startswith("H2") and "h2_sections" in updated_content:
-                # Handle H2 section updates - would need specific logic based on H2 structure
-                logger.info(f"H2 section update needed for: {section}")
-            else:
-                logger.warning(f"Field {field_name} not found in webpage content")
+            logger.warning(f"Field for section {section} not found in webpage content")
+            updated_content = dict(webpage_output)
 
         return updated_content
 
@@ -122,20 +135,75 @@ async def get_data(set_number: int):
     }
 
 
+@router.get("/guardrails/cache-stats")
+async def guardrails_cache_stats():
+    """Hit/miss counters of the guardrail verdict cache"""
+    return verdict_cache.stats()
+
+
+@router.get("/token-usage")
+async def token_usage_stats():
+    """Prompt and completion tokens per chain, section kind and action type"""
+    return token_usage.stats()
+
+
 @router.post("/ask-ai")
-async def ask_ai(request: AIRequest):
-    selected_text = request.selected_text
-    user_question = request.user_question
-    current_set = request.current_set
-    current_page = request.current_page
-    webpage_output = request.webpage_output
-    payload_output = request.payload_output
-    action_type = request.action_type
+async def ask_ai(request: AIRequest, http_request: Request):
+    return await serve_until_disconnect(
+        http_request,
+        ASK_AI_DEADLINE,
+        answer_ai_question(
+            request.selected_text,
+            request.user_question,
+            request.action_type,
+            request.current_set,
+            request.current_page,
+            request.webpage_output,
+            request.payload_output,
+        ),
+    )
+
 
+async def serve_until_disconnect(http_request: Request, default_deadline, handler):
+    """
+    Await an API handler coroutine within the request's deadline (X-Request-Deadline or
+    default_deadline seconds), cancelling its LLM calls if the client disconnects
+    """
+    start_budget(deadline_seconds(http_request.headers, default_deadline))
+    try:
+        return await run_until_disconnect(http_request.receive, handler)
+    except ClientDisconnected:
+        logger.info("Client disconnected, pending LLM calls cancelled")
+        return {"success": False, "response": "Client disconnected"}
+
+
+@timed_request("ask-ai")
+@traced
+async def answer_ai_question(
+    selected_text,
+    user_question,
+    action_type,
+    current_set,
+    current_page,
+    webpage_output,
+    payload_output,
+    site_payload=None,
+    site_output=None,
+    on_site_update=None,
+):
+    """
+    Shared body of /ask-ai and the session endpoints.
+
+    webpage_output/payload_output describe the page the text was selected on;
+    site_payload/site_output are the whole site handed to the workflow and default to
+    the bundled test data for current_set. site_output is never modified: a legacy
+    direct update builds a new model_output, which is passed to on_site_update if given.
+    """
     page_name = webpage_output.get(
         "Page Name", payload_output.get("title", f"Page {current_page + 1}")
     )
     content_section = identify_content_section(selected_text, webpage_output)
+    set_usage_labels(content_section, action_type, ACTION_QUESTIONS)
 
     # Determine the actual question to process
     if action_type and action_type in ACTION_QUESTIONS:
@@ -168,14 +236,14 @@ async def ask_ai(request: AIRequest):
         "is_predefined_action": bool(action_type),
     }
 
-    logger.info(json.dumps(simplified_response, indent=4, ensure_ascii=False))
-    logger.info("=" * 60)
+    log_payload("ASK-AI REQUEST SUMMARY", simplified_response)
 
     if selected_text:
         try:
-            all_pages_names = get_page_titles_flexible(combined_data, current_set - 1)
-            payload_output = combined_data[current_set - 1]
-            webpage_output_for_api = webpage_content_output_test_data[current_set - 1]
+            if site_payload is None:
+                site_payload = combined_data[current_set - 1]
+                site_output = webpage_content_output_test_data[current_set - 1]
+            all_pages_names = page_titles(site_payload)
 
             selected_text_fixed = (
                 selected_text
@@ -187,13 +255,16 @@ async def ask_ai(request: AIRequest):
 
             # Call the workflow function
             response = await get_updated_page_content_openai(
-                payload_output,
-                webpage_output_for_api,
+                site_payload,
+                site_output,
                 page_name,
                 actual_question,
                 selected_text_fixed,
                 content_section,
                 all_pages_names,
+                precomputed_verdicts=get_precomputed_verdicts(
+                    action_type, content_section
+                ),
             )
 
             logger.info("=" * 60)
@@ -229,6 +300,8 @@ async def ask_ai(request: AIRequest):
                 else:
                     # This is the legacy direct update format
                     logger.info("Processing as direct update response (legacy format)")
+                    if on_site_update is not None:
+                        on_site_update(response)
 
                     updated_page = extract_updated_page_from_response(
                         response, current_set, current_page
@@ -312,11 +385,183 @@ AI Analysis: This is a regular AI response. To update page content, try selectin
         }
 
 
+def sse_event(event: str, data: Any) -> str:
+    """Format one Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@router.post("/ask-ai/stream")
+async def ask_ai_stream(request: AIRequest, http_request: Request):
+    """
+    Server-Sent Events variant of /ask-ai for suggestion requests.
+
+    Emits a "guardrails" event once validation passes, one "suggestion" event per suggested
+    output as soon as the model has finished it, and a final "summary" event carrying the
+    same payload /ask-ai would have returned.
+    """
+    return stream_ai_question(
+        request.selected_text,
+        request.user_question,
+        request.action_type,
+        request.current_set,
+        request.current_page,
+        request.webpage_output,
+        request.payload_output,
+        http_request=http_request,
+    )
+
+
+def stream_ai_question(
+    selected_text,
+    user_question,
+    action_type,
+    current_set,
+    current_page,
+    webpage_output,
+    payload_output,
+    site_payload=None,
+    site_output=None,
+    http_request: Optional[Request] = None,
+) -> StreamingResponse:
+    """
+    Shared body of the streaming endpoints; arguments as for answer_ai_question.
+    With http_request, the stream stops at the request's deadline and its LLM calls are
+    cancelled when the client disconnects.
+    """
+    if action_type and action_type in ACTION_QUESTIONS:
+        actual_question = ACTION_QUESTIONS[action_type]
+    elif user_question and user_question.strip():
+        actual_question = user_question
+    else:
+        actual_question = None
+
+    if not selected_text or actual_question is None:
+        # Nothing to generate; the regular handler builds the info/error response
+        async def single_event():
+            summary = await answer_ai_question(
+                selected_text,
+                user_question,
+                action_type,
+                current_set,
+                current_page,
+                webpage_output,
+                payload_output,
+                site_payload,
+                site_output,
+            )
+            yield sse_event("summary", summary)
+
+        return StreamingResponse(single_event(), media_type="text/event-stream")
+
+    page_name = webpage_output.get(
+        "Page Name", payload_output.get("title", f"Page {current_page + 1}")
+    )
+    content_section = identify_content_section(selected_text, webpage_output)
+    simplified_response = {
+        "set_number": current_set - 1,
+        "page_name": page_name,
+        "content_section": content_section,
+        "selected_text": selected_text,
+        "user_question": actual_question,
+        "action_type": action_type,
+        "is_predefined_action": bool(action_type),
+    }
+
+    async def events():
+        set_usage_labels(content_section, action_type, ACTION_QUESTIONS)
+        if TRACING:
+            start_trace()
+        if http_request is not None:
+            start_budget(
+                deadline_seconds(http_request.headers, ASK_AI_STREAM_DEADLINE)
+            )
+        with request_span("ask-ai-stream") as span:
+            try:
+                site = (site_payload, site_output)
+                if site_payload is None:
+                    site = (
+                        combined_data[current_set - 1],
+                        webpage_content_output_test_data[current_set - 1],
+                    )
+                workflow_events = stream_updated_page_content_openai(
+                    site[0],
+                    site[1],
+                    page_name,
+                    actual_question,
+                    selected_text,
+                    content_section,
+                    page_titles(site[0]),
+                    precomputed_verdicts=get_precomputed_verdicts(
+                        action_type, content_section
+                    ),
+                )
+                if http_request is not None:
+                    workflow_events = stream_until_disconnect(
+                        http_request.receive, workflow_events
+                    )
+                async for event, data in workflow_events:
+                    if event == "rejected":
+                        span.outcome = REJECTED
+                        yield sse_event(
+                            "summary",
+                            {
+                                "success": True,
+                                "response_type": "error",
+                                "response": f"Update failed: {data}",
+                                "updated_content": data,
+                                "summary": simplified_response,
+                            },
+                        )
+                    elif event == "guardrails":
+                        yield sse_event(
+                            "guardrails", {**data, "content_section": content_section}
+                        )
+                    elif event == "suggestion":
+                        yield sse_event("suggestion", data)
+                    elif event == "complete":
+                        yield sse_event(
+                            "summary",
+                            {
+                                "success": True,
+                                "response_type": "suggestions",
+                                "suggestions": data,
+                                "message": f"Here are suggested improvements for the selected text in the {content_section} section:",
+                                "summary": simplified_response,
+                                "action_applied": action_type,
+                            },
+                        )
+            except Exception as e:
+                span.outcome = ERROR
+                tb_str = traceback.format_exc()
+                logger.error(f"Exception in ask_ai_stream: {str(e)}")
+                logger.error(f"Traceback:\n{tb_str}")
+                yield sse_event(
+                    "summary",
+                    attach_trace(
+                        {
+                            "success": False,
+                            "response": f"Error processing request: {str(e)}",
+                            "error": str(e),
+                            "summary": simplified_response,
+                        }
+                    ),
+                )
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @router.post("/apply-selection")
+@timed_request("apply-selection")
+@traced
 async def apply_selection(request: SelectionRequest):
     """
     Apply the selected suggestion to the content
     """
+    set_usage_labels(request.selected_option.get("section"), APPLY_SELECTION_ACTION)
     try:
         selected_option = request.selected_option
         current_set = request.current_set
@@ -324,10 +569,8 @@ async def apply_selection(request: SelectionRequest):
         webpage_output = request.webpage_output
         payload_output = request.payload_output
 
-        logger.info("=" * 60)
-        logger.info("APPLYING USER SELECTION:")
-        logger.info(f"Selection: {json.dumps(selected_option, indent=2)}")
-        logger.info("=" * 60)
+        logger.info(f"Applying user selection to {selected_option.get('section', '')}")
+        log_payload("APPLYING USER SELECTION", selected_option)
 
         # Apply the selection to the webpage content
         updated_content = apply_selection_to_content(webpage_output, selected_option)
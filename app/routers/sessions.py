@@ -0,0 +1,252 @@
+from fastapi import APIRouter, Request
+from pydantic import BaseModel
+from typing import Optional, List, Dict, Any
+import logging
+import traceback
+
+from test_data import combined_data, webpage_content_output_test_data
+from app.routers.api import (
+    answer_ai_question,
+    stream_ai_question,
+    apply_selection_to_content,
+    page_titles,
+    serve_until_disconnect,
+)
+from app.utils.content_utils import convert_page_keys_for_update
+from app.utils.sessions import session_store
+from webchat.core.metrics import timed_request
+from webchat.settings import ASK_AI_DEADLINE
+from webchat.core.token_usage import APPLY_SELECTION_ACTION, set_usage_labels
+from webchat.core.trace import traced
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+
+class SessionOpenRequest(BaseModel):
+    current_set: int = 1
+    # Optional uploaded documents; the bundled test data for current_set is used otherwise
+    payload_data: Optional[dict] = None
+    model_output: Optional[List[dict]] = None
+
+
+class SessionAIRequest(BaseModel):
+    version: int
+    current_page: int
+    selected_text: str
+    user_question: str = ""
+    action_type: Optional[str] = None
+
+
+class SessionUndoRequest(BaseModel):
+    version: int
+
+
+class SessionSelectionRequest(BaseModel):
+    version: int
+    current_page: int
+    selected_option: Dict[str, Any]
+
+
+def stale_version(session):
+    return {
+        "success": False,
+        "response": "The document has changed since it was loaded. Please reload it.",
+        "error": "stale_version",
+        "version": session.version,
+    }
+
+
+def resolve_session(session_id: str, version: int, current_page: int):
+    """Return (session, None) or (None, error response) for stale or unknown sessions"""
+    session = session_store.get(session_id)
+    if session is None:
+        return None, {
+            "success": False,
+            "response": "Session not found or expired. Please reopen the document.",
+            "error": "session_not_found",
+        }
+    if version != session.version:
+        return None, stale_version(session)
+    if not 0 <= current_page < len(session.model_output):
+        return None, {
+            "success": False,
+            "response": f"Invalid page index {current_page}",
+            "error": "invalid_page",
+        }
+    return session, None
+
+
+@router.post("")
+async def open_session(request: SessionOpenRequest):
+    """Open a server-side document session for one site"""
+    payload_data = request.payload_data
+    model_output = request.model_output
+    if payload_data is None or model_output is None:
+        if request.current_set < 1 or request.current_set > len(combined_data):
+            return {
+                "success": False,
+                "response": f"Invalid set number. Must be 1 to {len(combined_data)}",
+            }
+        index = request.current_set - 1
+        payload_data = combined_data[index]
+        model_output = webpage_content_output_test_data[index]
+
+    session = session_store.open(request.current_set, payload_data, model_output)
+    logger.info(f"Opened document session {session.session_id}")
+    return {
+        "success": True,
+        "session_id": session.session_id,
+        "version": session.version,
+        "page_names": page_titles(session.payload_data),
+    }
+
+
+@router.delete("/{session_id}")
+async def close_session(session_id: str):
+    return {"success": session_store.close(session_id)}
+
+
+@router.post("/{session_id}/undo")
+async def session_undo(session_id: str, request: SessionUndoRequest):
+    """
+    Revert the last applied edit and return the pages that changed
+    """
+    session, error = resolve_session(session_id, request.version, 0)
+    if error:
+        return error
+
+    before = session.document
+    version = session.undo()
+    if version is None:
+        return {
+            "success": False,
+            "response": "Nothing to undo",
+            "version": session.version,
+        }
+
+    # Unchanged pages are shared between versions, so identity tells what was reverted
+    updated_pages = [
+        {
+            "page_index": index,
+            "content": convert_page_keys_for_update(session.page(index)),
+        }
+        for index in range(len(session.document))
+        if session.page(index) is not before.page(index)
+    ]
+    return {
+        "success": True,
+        "response": "Last change undone.",
+        "version": version,
+        "updated_pages": updated_pages,
+    }
+
+
+@router.post("/{session_id}/ask-ai")
+async def session_ask_ai(
+    session_id: str, request: SessionAIRequest, http_request: Request
+):
+    session, error = resolve_session(session_id, request.version, request.current_page)
+    if error:
+        return error
+
+    # Edits may land while the LLM call runs; the update is applied relative to this one
+    base = session.document
+    conflicts = []
+
+    def on_site_update(output):
+        if session.commit_model_output(base, output) is None:
+            conflicts.append(output)
+
+    result = await serve_until_disconnect(
+        http_request,
+        ASK_AI_DEADLINE,
+        answer_ai_question(
+            request.selected_text,
+            request.user_question,
+            request.action_type,
+            session.set_number,
+            request.current_page,
+            session.page(request.current_page),
+            session.left_panel(request.current_page),
+            session.payload_data,
+            session.model_output,
+            on_site_update=on_site_update,
+        ),
+    )
+    if conflicts:
+        logger.warning(
+            f"Dropped AI update for session {session_id}: its pages changed during the call"
+        )
+        return stale_version(session)
+    result["version"] = session.version
+    return result
+
+
+@router.post("/{session_id}/ask-ai/stream")
+async def session_ask_ai_stream(
+    session_id: str, request: SessionAIRequest, http_request: Request
+):
+    session, error = resolve_session(session_id, request.version, request.current_page)
+    if error:
+        return error
+
+    return stream_ai_question(
+        request.selected_text,
+        request.user_question,
+        request.action_type,
+        session.set_number,
+        request.current_page,
+        session.page(request.current_page),
+        session.left_panel(request.current_page),
+        session.payload_data,
+        session.model_output,
+        http_request=http_request,
+    )
+
+
+@router.post("/{session_id}/apply-selection")
+@timed_request("apply-selection")
+@traced
+async def session_apply_selection(session_id: str, request: SessionSelectionRequest):
+    """
+    Apply the selected suggestion to the session's copy of the page
+    """
+    set_usage_labels(request.selected_option.get("section"), APPLY_SELECTION_ACTION)
+    session, error = resolve_session(session_id, request.version, request.current_page)
+    if error:
+        return error
+
+    try:
+        selected_option = request.selected_option
+        updated_content = apply_selection_to_content(
+            session.page(request.current_page), selected_option
+        )
+        version = session.replace_page(request.current_page, updated_content)
+        converted_page = convert_page_keys_for_update(updated_content)
+
+        return {
+            "success": True,
+            "response": "Content successfully updated with your selection!",
+            "updated_content": [converted_page],
+            "version": version,
+            "summary": {
+                "set_number": session.set_number - 1,
+                "page_name": updated_content.get(
+                    "Page Name", f"Page {request.current_page + 1}"
+                ),
+                "selected_section": selected_option.get("section", ""),
+                "selected_output": selected_option.get("selected_output", ""),
+            },
+        }
+
+    except Exception as e:
+        tb_str = traceback.format_exc()
+        logger.error(f"Exception in session_apply_selection: {str(e)}")
+        logger.error(f"Traceback:\n{tb_str}")
+
+        return {
+            "success": False,
+            "response": f"Error applying selection: {str(e)}",
+            "error": str(e),
+        }
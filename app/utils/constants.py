@@ -1,3 +1,8 @@
+import json
+import os
+
+from webchat.core.page_schema import section_kind
+
 # Action to question mapping
 ACTION_QUESTIONS = {
     "rewrite-clarity": """
@@ -60,3 +65,27 @@ Shorten this content while preserving all essential meaning, intent, and factual
 """,
     "fix-grammar": "Fix any grammar and punctuation errors in this text",
 }
+
+
+# Precomputed guardrail verdicts for the preset actions above, generated offline by
+# scripts/precompute_action_verdicts.py with the real validators. Layout:
+# {action_type: {section_kind: {copy_value: {"score": 0 | 1, "reason": str}}}}
+# where copy_value is "no" for pages with copy == "no" (copyright check on) and "yes" otherwise.
+ACTION_VERDICTS_PATH = os.path.join(os.path.dirname(__file__), "action_verdicts.json")
+
+
+def load_action_verdicts(path=ACTION_VERDICTS_PATH):
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+PRECOMPUTED_ACTION_VERDICTS = load_action_verdicts()
+
+
+def get_precomputed_verdicts(action_type, section):
+    """Return the precomputed verdicts keyed by copy value, or None if this action/section has none"""
+    if not action_type:
+        return None
+    return PRECOMPUTED_ACTION_VERDICTS.get(action_type, {}).get(section_kind(section))
@@ -1,34 +1,17 @@
 import logging
 import traceback
+from bisect import bisect_right
+from collections import OrderedDict
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from webchat.core.page_schema import to_api_keys
 
 logger = logging.getLogger(__name__)
 
 
 def convert_page_keys_for_update(page_data):
     """Convert page keys from display format to API format"""
-    key_map = {
-        "Page Name": "Page_Name",
-        "Meta Title (30 to 60 Characters)": "Meta_Title",
-        "Meta Description (70 to 143 Characters)": "Meta_Description",
-        "Hero Title (20 to 70 Characters)": "Hero_Title",
-        "Hero Text (50 to 100 Characters)": "Hero_Text",
-        "Hero CTA": "Hero_CTA",
-        "Header": "Header",
-        "Leading Sentence": "Leading_Sentence",
-        "CTA Button": "CTA_Button",
-        "Image Recommendations": "Image_Recommendations",
-        "h2_sections": "h2_sections",
-        "H1 (30 to 70 Characters)": "H1",
-        "H1 Content": "H1_Content",
-    }
-
-    converted_page = {}
-    for original_key, value in page_data.items():
-        if original_key in key_map:
-            converted_key = key_map[original_key]
-            converted_page[converted_key] = value
-        else:
-            converted_page[original_key] = value
+    converted_page = to_api_keys(page_data)
 
     logger.info(f"Converted page keys: {list(converted_page.keys())}")
     return converted_page
@@ -118,72 +101,180 @@ def extract_updated_page_from_response(response, current_set, current_page):
         return None
 
 
+# Top-level fields in the order identify_content_section checks them, with the section
+# name it reports. H2 sections are checked after H1 Content, Image Recommendations last.
+LOCATOR_FIELDS = [
+    ("Hero Title (20 to 70 Characters)", "Hero Title"),
+    ("Hero Text (50 to 100 Characters)", "Hero Text"),
+    ("Hero CTA", "Hero CTA"),
+    ("Meta Title (30 to 60 Characters)", "Meta Title"),
+    ("Meta Description (70 to 143 Characters)", "Meta Description"),
+    ("H1 (30 to 70 Characters)", "H1 Title"),
+    ("H1 Content", "H1 Content"),
+    ("h2_sections", None),
+    ("CTA Button", "CTA Button"),
+    ("Header", "Header"),
+    ("Leading Sentence", "Leading Sentence"),
+    ("Image Recommendations", None),
+]
+
+# Separates segments in the search corpus; selections never contain it
+SEGMENT_SEPARATOR = "\x00"
+
+LOCATOR_CACHE_SIZE = 512
+
+
+class SectionMatch(NamedTuple):
+    section: str  # as reported by identify_content_section
+    path: Tuple[Any, ...]  # page_schema path of the field
+    start: int  # span of the match inside the field's text
+    end: int
+
+
+def searchable_text(value) -> Optional[str]:
+    """Lowercased text of a field the way identify_content_section compares it"""
+    if isinstance(value, list):
+        value = " ".join(item for item in value if isinstance(item, str))
+    if not isinstance(value, str) or not value:
+        return None
+    return value.lower()
+
+
+def field_segments(page, key, section, previous=None):
+    """
+    (section, path, lowered text) segments for one top-level field. previous maps
+    key -> (value, segments) from an older index; an unchanged value reuses its segments,
+    and within h2_sections every unchanged H2 section reuses its own.
+    """
+    value = page.get(key)
+    old_value, old_segments = (previous or {}).get(key, (None, []))
+    if previous is not None and old_value is value:
+        return old_segments
+
+    segments = []
+    if key == "h2_sections":
+        for i, h2 in enumerate(value or []):
+            if not isinstance(h2, dict):
+                continue
+            if (
+                isinstance(old_value, list)
+                and i < len(old_value)
+                and old_value[i] is h2
+            ):
+                segments.extend(
+                    segment for segment in old_segments if segment[1][1] == i
+                )
+                continue
+            for field in ("Heading", "Content"):
+                text = searchable_text(h2.get(f"H2 {field}") or h2.get(f"H2_{field}"))
+                if text is not None:
+                    segments.append(
+                        (
+                            f"H2 {field} (Section {i + 1})",
+                            ("h2_sections", i, f"H2 {field}"),
+                            text,
+                        )
+                    )
+    elif key == "Image Recommendations":
+        for i, recommendation in enumerate(value or []):
+            text = searchable_text(recommendation)
+            if text is not None:
+                segments.append((f"Image Recommendation {i + 1}", (key, i), text))
+    else:
+        text = searchable_text(value)
+        if text is not None:
+            segments.append((section, (key,), text))
+    return segments
+
+
+class ContentIndex:
+    """
+    Search index for one page version.
+
+    Every searchable field is lowercased (and list values joined) once and laid out in
+    check order in a single corpus string; offsets map a corpus position back to its
+    field. A lookup is one str.find pass over the corpus per match (CPython's two-way /
+    Horspool search, sublinear on typical text), so finding every section that contains
+    the selection costs about as much as the old first-match scan.
+    """
+
+    def __init__(self, page: Dict[str, Any], previous: "ContentIndex" = None):
+        self.page = page
+        self.fields = {}
+        old_fields = previous.fields if previous is not None else None
+        for key, section in LOCATOR_FIELDS:
+            self.fields[key] = (
+                page.get(key),
+                field_segments(page, key, section, old_fields),
+            )
+
+        self.segments = [
+            segment for _, segments in self.fields.values() for segment in segments
+        ]
+        self.starts = []
+        offset = 0
+        for _, _, text in self.segments:
+            self.starts.append(offset)
+            offset += len(text) + len(SEGMENT_SEPARATOR)
+        self.corpus = SEGMENT_SEPARATOR.join(text for _, _, text in self.segments)
+
+    def with_page(self, page: Dict[str, Any]) -> "ContentIndex":
+        """Index for a newer version of the page; only changed fields are re-processed"""
+        return ContentIndex(page, self)
+
+    def locate(self, selected_text: str) -> List[SectionMatch]:
+        """Every occurrence of the selection, in identify_content_section check order"""
+        needle = selected_text.lower().strip()
+        if SEGMENT_SEPARATOR in needle or not self.segments:
+            return []
+        if not needle:
+            # An empty selection is "found" at the start of the first non-empty field
+            section, path, _ = self.segments[0]
+            return [SectionMatch(section, path, 0, 0)]
+
+        matches = []
+        position = self.corpus.find(needle)
+        while position != -1:
+            index = bisect_right(self.starts, position) - 1
+            section, path, _ = self.segments[index]
+            start = position - self.starts[index]
+            matches.append(SectionMatch(section, path, start, start + len(needle)))
+            position = self.corpus.find(needle, position + max(len(needle), 1))
+        return matches
+
+
+# Most recent index per page name; identity of the page dict identifies its version,
+# since page documents are copy-on-write
+content_indexes: "OrderedDict[str, ContentIndex]" = OrderedDict()
+
+
+def content_index(webpage_data: Dict[str, Any]) -> ContentIndex:
+    """Cached index for this page version, derived from the previous version if known"""
+    name = str(webpage_data.get("Page Name", "")).casefold()
+    index = content_indexes.get(name)
+    if index is None:
+        index = ContentIndex(webpage_data)
+    elif index.page is not webpage_data:
+        index = index.with_page(webpage_data)
+    content_indexes[name] = index
+    content_indexes.move_to_end(name)
+    while len(content_indexes) > LOCATOR_CACHE_SIZE:
+        content_indexes.popitem(last=False)
+    return index
+
+
+def locate_sections(selected_text, webpage_data) -> List[SectionMatch]:
+    """All sections of the page containing selected_text, with spans"""
+    return content_index(webpage_data).locate(selected_text)
+
+
 def identify_content_section(selected_text, webpage_data):
     """Identify which content section the selected text belongs to"""
-    text_lower = selected_text.lower().strip()
-
-    if webpage_data.get("Hero Title (20 to 70 Characters)"):
-        if text_lower in webpage_data["Hero Title (20 to 70 Characters)"].lower():
-            return "Hero Title"
-
-    if webpage_data.get("Hero Text (50 to 100 Characters)"):
-        if text_lower in webpage_data["Hero Text (50 to 100 Characters)"].lower():
-            return "Hero Text"
-
-    if webpage_data.get("Hero CTA"):
-        if text_lower in webpage_data["Hero CTA"].lower():
-            return "Hero CTA"
-
-    if webpage_data.get("Meta Title (30 to 60 Characters)"):
-        if text_lower in webpage_data["Meta Title (30 to 60 Characters)"].lower():
-            return "Meta Title"
-
-    if webpage_data.get("Meta Description (70 to 143 Characters)"):
-        if (
-            text_lower
-            in webpage_data["Meta Description (70 to 143 Characters)"].lower()
-        ):
-            return "Meta Description"
-
-    if webpage_data.get("H1 (30 to 70 Characters)"):
-        if text_lower in webpage_data["H1 (30 to 70 Characters)"].lower():
-            return "H1 Title"
-
-    if webpage_data.get("H1 Content"):
-        h1_content = webpage_data["H1 Content"]
-        if isinstance(h1_content, list):
-            h1_content = " ".join(h1_content)
-        if text_lower in h1_content.lower():
-            return "H1 Content"
-
-    if webpage_data.get("h2_sections"):
-        for i, section in enumerate(webpage_data["h2_sections"]):
-            h2_heading = section.get("H2 Heading") or section.get("H2_Heading")
-            if h2_heading and text_lower in h2_heading.lower():
-                return f"H2 Heading (Section {i + 1})"
-
-            h2_content = section.get("H2 Content") or section.get("H2_Content")
-            if h2_content:
-                if isinstance(h2_content, list):
-                    h2_content = " ".join(h2_content)
-                if text_lower in h2_content.lower():
-                    return f"H2 Content (Section {i + 1})"
-
-    if webpage_data.get("CTA Button"):
-        if text_lower in webpage_data["CTA Button"].lower():
-            return "CTA Button"
-
-    if webpage_data.get("Header"):
-        if text_lower in webpage_data["Header"].lower():
-            return "Header"
-
-    if webpage_data.get("Leading Sentence"):
-        if text_lower in webpage_data["Leading Sentence"].lower():
-            return "Leading Sentence"
-
-    if webpage_data.get("Image Recommendations"):
-        for i, img_rec in enumerate(webpage_data["Image Recommendations"]):
-            if text_lower in img_rec.lower():
-                return f"Image Recommendation {i + 1}"
-
-    return "Unknown Section"
+    matches = locate_sections(selected_text, webpage_data)
+    if not matches:
+        return "Unknown Section"
+    if len({match.section for match in matches}) > 1:
+        logger.info(
+            f"Selected text found in {len(matches)} places; using {matches[0].section}"
+        )
+    return matches[0].section
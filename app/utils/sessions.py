@@ -0,0 +1,157 @@
+"""
+Server-side document sessions.
+
+A client opens a session once for a site (payload + generated pages) and afterwards only
+sends the session id, the document version it last saw and its selection. Each session
+holds a copy-on-write SiteDocument: an edit produces a new version that shares every
+unchanged page with the previous one, so opening a session costs no copy and keeping
+the last SESSION_HISTORY_SIZE versions for undo costs only the pages that changed.
+Sessions idle for longer than the TTL expire.
+"""
+
+import logging
+import time
+import uuid
+from collections import OrderedDict, deque
+from typing import Any, Dict, List, Optional
+
+from webchat.core.documents import SiteDocument
+from webchat.settings import SESSION_TTL, SESSION_MAX_COUNT, SESSION_HISTORY_SIZE
+
+logger = logging.getLogger(__name__)
+
+
+class DocumentSession:
+    def __init__(
+        self,
+        session_id: str,
+        set_number: int,
+        payload_data: Dict[str, Any],
+        model_output: List[Dict[str, Any]],
+    ):
+        self.session_id = session_id
+        self.set_number = set_number
+        self.payload_data = payload_data
+        self.document = SiteDocument.from_model_output(model_output)
+        self.history: deque = deque(maxlen=SESSION_HISTORY_SIZE)
+        self.last_used = time.monotonic()
+
+    @property
+    def version(self) -> int:
+        return self.document.version
+
+    @property
+    def model_output(self) -> List[Dict[str, Any]]:
+        """Current pages in model_output form; shared with the document, do not mutate"""
+        return self.document.to_model_output()
+
+    def page(self, page_index: int) -> Dict[str, Any]:
+        """Generated content of the page at page_index"""
+        return self.document.page(page_index)
+
+    def left_panel(self, page_index: int) -> Dict[str, Any]:
+        """Payload (left panel) entry of the page at page_index"""
+        pages = self.payload_data.get("pages", [])
+        return pages[page_index] if page_index < len(pages) else {}
+
+    def commit(self, document: Optional[SiteDocument]) -> int:
+        """Make document the current version, keeping the previous one for undo"""
+        if document is not None:
+            self.history.append(self.document)
+            self.document = document
+        return self.document.version
+
+    def commit_model_output(
+        self, base: SiteDocument, model_output: List[Dict[str, Any]]
+    ) -> Optional[int]:
+        """
+        Commit a model_output built from the base version. If other edits landed since,
+        only the pages model_output changed are applied onto the current version. Returns
+        None, committing nothing, when one of those pages was itself edited meanwhile.
+        """
+        document = base.with_model_output(model_output)
+        if document is None or self.document is base:
+            return self.commit(document)
+        current = self.document
+        if len(document) != len(base) or len(current) != len(base):
+            return None
+        changed = [
+            index
+            for index, (new, old) in enumerate(zip(document.entries, base.entries))
+            if new is not old
+        ]
+        if any(current.entries[index] is not base.entries[index] for index in changed):
+            return None
+        entries = list(current.entries)
+        for index in changed:
+            entries[index] = document.entries[index]
+        return self.commit(SiteDocument(entries, current.version + 1))
+
+    def replace_page(self, page_index: int, page: Dict[str, Any]) -> int:
+        """Store an edited page and return the new document version"""
+        return self.commit(self.document.with_page(page_index, page))
+
+    def undo(self) -> Optional[int]:
+        """
+        Go back to the previous version. The restored content gets a new version number
+        so clients holding the undone version see it as stale. Returns None when there is
+        nothing to undo.
+        """
+        if not self.history:
+            return None
+        previous = self.history.pop()
+        self.document = SiteDocument(previous.entries, self.document.version + 1)
+        return self.document.version
+
+
+class DocumentSessionStore:
+    def __init__(self, ttl: float = SESSION_TTL, max_sessions: int = SESSION_MAX_COUNT):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.sessions: "OrderedDict[str, DocumentSession]" = OrderedDict()
+
+    def open(
+        self,
+        set_number: int,
+        payload_data: Dict[str, Any],
+        model_output: List[Dict[str, Any]],
+    ) -> DocumentSession:
+        self.expire()
+        session = DocumentSession(
+            uuid.uuid4().hex,
+            set_number,
+            # Shared, not copied: the payload is read-only and page edits are copy-on-write
+            payload_data,
+            model_output,
+        )
+        self.sessions[session.session_id] = session
+        while len(self.sessions) > self.max_sessions:
+            evicted_id, _ = self.sessions.popitem(last=False)
+            logger.info(f"Evicted document session {evicted_id}")
+        return session
+
+    def get(self, session_id: str) -> Optional[DocumentSession]:
+        session = self.sessions.get(session_id)
+        if session is None:
+            return None
+        if time.monotonic() - session.last_used > self.ttl:
+            del self.sessions[session_id]
+            return None
+        session.last_used = time.monotonic()
+        self.sessions.move_to_end(session_id)
+        return session
+
+    def close(self, session_id: str) -> bool:
+        return self.sessions.pop(session_id, None) is not None
+
+    def expire(self) -> None:
+        now = time.monotonic()
+        for session_id in [
+            session_id
+            for session_id, session in self.sessions.items()
+            if now - session.last_used > self.ttl
+        ]:
+            del self.sessions[session_id]
+
+
+session_store = DocumentSessionStore()
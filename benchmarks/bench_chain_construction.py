@@ -0,0 +1,68 @@
+"""
+Microbenchmark: per-request chain construction vs the prebuilt chain registry.
+
+Measures only the CPU spent turning a prompt and schema into a runnable
+(prompt | llm.with_structured_output(schema)); no request is sent to OpenAI.
+
+    python -m benchmarks.bench_chain_construction --iterations 2000
+"""
+
+import argparse
+import os
+import time
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark-no-network")
+
+from webchat.core.chains import core_chains, guardrails_chains  # noqa: E402,F401
+from webchat.core.chains.registry import (  # noqa: E402
+    build_chain,
+    chain_specs,
+    get_chain,
+)
+
+# The chains every /api/ask-ai request goes through
+REQUEST_CHAINS = [
+    "query_validator",
+    "copyright_validator",
+    "guidelines_validator",
+    "updated_website",
+]
+
+
+def time_per_request(build, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        for name in REQUEST_CHAINS:
+            build(name)
+    return (time.perf_counter() - start) / iterations
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--iterations", type=int, default=1000)
+    args = parser.parse_args()
+
+    missing = [name for name in REQUEST_CHAINS if name not in chain_specs]
+    if missing:
+        raise SystemExit(f"Chains not registered: {missing}")
+
+    # Warm both paths once so imports and the registry cache are not counted
+    time_per_request(build_chain, 1)
+    time_per_request(get_chain, 1)
+
+    per_call = time_per_request(build_chain, args.iterations)
+    cached = time_per_request(get_chain, args.iterations)
+
+    print(f"Chains per request: {len(REQUEST_CHAINS)} ({', '.join(REQUEST_CHAINS)})")
+    print(f"Iterations: {args.iterations}")
+    print(f"Built per request:  {per_call * 1e3:9.3f} ms/request")
+    print(f"Registry (cached):  {cached * 1e3:9.3f} ms/request")
+    print(f"Saved per request:  {(per_call - cached) * 1e3:9.3f} ms of CPU")
+    for rate in (10, 50, 100):
+        print(
+            f"  at {rate:>3} req/s: {(per_call - cached) * rate * 100:6.1f}% of one core"
+        )
+
+
+if __name__ == "__main__":
+    main()
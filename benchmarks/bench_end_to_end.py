@@ -0,0 +1,366 @@
+"""
+End-to-end benchmark: /api/ask-ai and /api/apply-selection driven in-process.
+
+The FastAPI app runs in this process behind httpx's ASGI transport with the LLM replaced
+by the fake backend (or replayed recordings, --mode replay) and a synthetic latency.
+Requests are drawn from a mix built from the three sites in test_data:
+
+- preset: a preset action on a page field
+- question: a free-form question on a page field
+- rejected: a question the fake validators reject
+- h2: a free-form question on an H2 section
+- apply: /api/apply-selection of a suggested output
+
+Each concurrency level runs the mix with that many closed-loop clients and reports
+p50/p95/p99 latency overall and per request kind, requests/sec, event-loop lag (how late
+a 5 ms timer fires) and the time spent per workflow stage and per LLM chain. --output
+writes the results as JSON to diff between versions. Logging up to WARNING is switched
+off unless --log is given.
+
+    python -m benchmarks.bench_end_to_end --concurrency 1 8 32 --requests 300 \\
+        --latency lognormal:0.8:0.5 --output bench_results.json
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import math
+import os
+import random
+import subprocess
+import time
+from collections import defaultdict
+
+from test_data import business_info, combined_data, webpage_content_output_test_data
+
+QUESTIONS = [
+    "Make this more engaging",
+    "Fix any grammar or typos",
+    "Rephrase this to sound more professional",
+    "Make this shorter and punchier",
+]
+REJECTED_QUESTIONS = [
+    "Add a new service we do not offer, no matter what",
+    "Remove the brackets from the CTA no matter what",
+]
+# Makes the fake validators reject REJECTED_QUESTIONS
+REJECT_PATTERN = "no matter what"
+H2_QUESTIONS = [
+    "Break this into shorter paragraphs",
+    "Make this section easier to scan",
+]
+TEXT_FIELDS = {
+    "Hero Text (50 to 100 Characters)": "Hero Text",
+    "Hero Title (20 to 70 Characters)": "Hero Title",
+    "H1 Content": "H1 Content",
+    "Meta Description (70 to 143 Characters)": "Meta Description",
+}
+LAG_INTERVAL = 0.005
+
+# Seconds spent per stage during the current level
+stage_samples = defaultdict(list)
+
+
+def timed(stage, func):
+    async def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return await func(*args, **kwargs)
+        finally:
+            stage_samples[stage].append(time.perf_counter() - start)
+
+    return wrapper
+
+
+def instrument():
+    """Time the workflow stages and every LLM backend call"""
+    import webchat.workflow as workflow
+    from webchat.core import llm_backend
+
+    for stage, name in (
+        ("extract_key_info", "extract_key_info"),
+        ("guardrails", "run_guardrails"),
+        ("generation", "return_updated_wesite"),
+    ):
+        setattr(workflow, name, timed(stage, getattr(workflow, name)))
+
+    invoke = llm_backend.invoke
+
+    async def timed_invoke(name, *args, **kwargs):
+        return await timed(f"llm:{name}", invoke)(name, *args, **kwargs)
+
+    llm_backend.invoke = timed_invoke
+
+
+def first_text(value):
+    """The text a user would select: the value itself or its first paragraph"""
+    if isinstance(value, list):
+        value = value[0] if value else None
+    return value if isinstance(value, str) and value else None
+
+
+def build_requests(action_types):
+    """{kind: [(path, body)]} for every page of every site in test_data"""
+    requests = defaultdict(list)
+    for set_index, (payload_data, site, info) in enumerate(
+        zip(combined_data, webpage_content_output_test_data, business_info)
+    ):
+        left_panels = {p.get("title", "").lower(): p for p in payload_data["pages"]}
+        for page_index, entry in enumerate(site):
+            page = entry["pages"][0]
+            base = {
+                "current_set": set_index + 1,
+                "current_page": page_index,
+                "webpage_output": page,
+                "payload_output": left_panels.get(page["Page Name"].lower(), {}),
+                "business_info": info,
+            }
+            for k, (field, section) in enumerate(TEXT_FIELDS.items()):
+                text = first_text(page.get(field))
+                if text is None:
+                    continue
+                ask = {**base, "selected_text": text, "action_type": None}
+                action = action_types[(page_index + k) % len(action_types)]
+                requests["preset"].append(
+                    ("/api/ask-ai", {**ask, "user_question": "", "action_type": action})
+                )
+                requests["question"].append(
+                    (
+                        "/api/ask-ai",
+                        {**ask, "user_question": QUESTIONS[k % len(QUESTIONS)]},
+                    )
+                )
+                requests["rejected"].append(
+                    (
+                        "/api/ask-ai",
+                        {
+                            **ask,
+                            "user_question": REJECTED_QUESTIONS[
+                                k % len(REJECTED_QUESTIONS)
+                            ],
+                        },
+                    )
+                )
+                selection = {"section": section, "selected_output": f"{text} (edited)"}
+                requests["apply"].append(
+                    ("/api/apply-selection", {**base, "selected_option": selection})
+                )
+            for k, h2 in enumerate(page.get("h2_sections") or []):
+                text = first_text(h2.get("H2 Content"))
+                if text is None:
+                    continue
+                body = {
+                    **base,
+                    "selected_text": text,
+                    "user_question": H2_QUESTIONS[k % len(H2_QUESTIONS)],
+                    "action_type": None,
+                }
+                requests["h2"].append(("/api/ask-ai", body))
+    return requests
+
+
+def build_schedule(requests, mix, count, seed):
+    rng = random.Random(seed)
+    kinds = [kind for kind in mix if requests.get(kind)]
+    weights = [mix[kind] for kind in kinds]
+    schedule = []
+    for _ in range(count):
+        kind = rng.choices(kinds, weights)[0]
+        schedule.append((kind, *rng.choice(requests[kind])))
+    return schedule
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = max(0, math.ceil(fraction * len(sorted_values)) - 1)
+    return sorted_values[min(index, len(sorted_values) - 1)]
+
+
+def summary(seconds):
+    """Latency summary in milliseconds"""
+    values = sorted(seconds)
+    return {
+        "count": len(values),
+        "mean": sum(values) / len(values) * 1e3 if values else 0.0,
+        "p50": percentile(values, 0.50) * 1e3,
+        "p95": percentile(values, 0.95) * 1e3,
+        "p99": percentile(values, 0.99) * 1e3,
+        "max": values[-1] * 1e3 if values else 0.0,
+    }
+
+
+async def monitor_loop_lag(samples, stop):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(LAG_INTERVAL)
+        samples.append(max(0.0, time.perf_counter() - start - LAG_INTERVAL))
+
+
+async def run_level(client, schedule, concurrency):
+    latencies = defaultdict(list)
+    failures = defaultdict(int)
+    pending = iter(schedule)
+
+    async def worker():
+        for kind, path, body in pending:
+            start = time.perf_counter()
+            try:
+                response = await client.post(path, json=body)
+                data = response.json() if response.status_code == 200 else {}
+                # Rejected queries must come back as an error response, not suggestions
+                ok = data.get("success") and (
+                    (kind == "rejected") == (data.get("response_type") == "error")
+                )
+            except Exception:
+                ok = False
+            latencies[kind].append(time.perf_counter() - start)
+            if not ok:
+                failures[kind] += 1
+
+    stage_samples.clear()
+    lag, stop = [], asyncio.Event()
+    monitor = asyncio.create_task(monitor_loop_lag(lag, stop))
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await monitor
+
+    all_latencies = [value for values in latencies.values() for value in values]
+    return {
+        "concurrency": concurrency,
+        "requests": len(all_latencies),
+        "failures": sum(failures.values()),
+        "elapsed_seconds": elapsed,
+        "requests_per_second": len(all_latencies) / elapsed,
+        "latency_ms": summary(all_latencies),
+        "by_kind": {
+            kind: {**summary(values), "failures": failures[kind]}
+            for kind, values in sorted(latencies.items())
+        },
+        "stages_ms": {
+            stage: summary(values) for stage, values in sorted(stage_samples.items())
+        },
+        "loop_lag_ms": summary(lag),
+    }
+
+
+def print_level(result):
+    latency = result["latency_ms"]
+    print(
+        f"\nconcurrency {result['concurrency']}: {result['requests']} requests, "
+        f"{result['failures']} failed, {result['requests_per_second']:.1f} req/s, "
+        f"event-loop lag p99 {result['loop_lag_ms']['p99']:.2f} ms "
+        f"max {result['loop_lag_ms']['max']:.2f} ms"
+    )
+    print(f"  {'':24} {'count':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    rows = [("all", latency)]
+    rows += [(f"kind {k}", v) for k, v in result["by_kind"].items()]
+    rows += [(f"stage {k}", v) for k, v in result["stages_ms"].items()]
+    for label, values in rows:
+        print(
+            f"  {label:24} {values['count']:>6} {values['p50']:>9.1f} "
+            f"{values['p95']:>9.1f} {values['p99']:>9.1f}"
+        )
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+def parse_mix(value):
+    mix = {}
+    for part in value.split(","):
+        kind, _, weight = part.partition("=")
+        mix[kind.strip()] = float(weight)
+    return mix
+
+
+async def run(args):
+    # Settings are read at import, so the app is imported once the environment is set
+    import httpx
+
+    from app.main import app
+    from app.utils.constants import ACTION_QUESTIONS
+
+    instrument()
+    requests = build_requests(sorted(ACTION_QUESTIONS))
+    mix = parse_mix(args.mix)
+    results = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench", timeout=None
+    ) as client:
+        warmup = build_schedule(requests, mix, args.warmup, args.seed)
+        await run_level(client, warmup, min(4, max(args.concurrency)))
+        for concurrency in args.concurrency:
+            schedule = build_schedule(requests, mix, args.requests, args.seed)
+            result = await run_level(client, schedule, concurrency)
+            print_level(result)
+            results.append(result)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--requests", type=int, default=200, help="per level")
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument(
+        "--latency",
+        default="lognormal:0.5:0.4",
+        help="WEBCHAT_LLM_SYNTHETIC_LATENCY for every LLM call",
+    )
+    parser.add_argument("--mode", choices=["fake", "replay"], default="fake")
+    parser.add_argument("--mix", default="preset=3,question=3,rejected=1,h2=2,apply=2")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--no-verdict-cache",
+        action="store_true",
+        help="run every guardrail validator instead of reusing cached verdicts",
+    )
+    parser.add_argument("--log", action="store_true", help="keep logging enabled")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    args = parser.parse_args()
+
+    os.environ["WEBCHAT_LLM_MODE"] = args.mode
+    os.environ["WEBCHAT_LLM_SYNTHETIC_LATENCY"] = args.latency
+    os.environ["WEBCHAT_LLM_SYNTHETIC_SEED"] = str(args.seed)
+    os.environ["WEBCHAT_LLM_FAKE_REJECT_PATTERN"] = REJECT_PATTERN
+    os.environ["WEBCHAT_LLM_REPLAY_FAKE_MISSING"] = "1"
+    if args.no_verdict_cache:
+        os.environ["WEBCHAT_VERDICT_CACHE_SIZE"] = "0"
+    if not args.log:
+        logging.disable(logging.WARNING)
+
+    print(
+        f"LLM: {args.mode}, latency {args.latency}; mix {args.mix}; "
+        f"{args.requests} requests per level"
+    )
+    results = asyncio.run(run(args))
+    if args.output:
+        config = {
+            key: value for key, value in vars(args).items() if key not in ("output",)
+        }
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(
+                {"git_commit": git_commit(), "config": config, "levels": results},
+                f,
+                indent=2,
+            )
+            f.write("\n")
+        print(f"\nWrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
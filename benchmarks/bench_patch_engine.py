@@ -0,0 +1,126 @@
+"""
+Microbenchmark: per-update page patching vs the batched patch engine.
+
+Builds synthetic sites of several hundred pages from the test data and applies the same
+batch of updates to one page with both paths:
+
+- legacy: one update_page_data / update_h2_section_content call per update, each
+  copying the page list and rescanning pages and fields (the old process_response_updates)
+- batched: process_response_updates, which compiles the batch once and copies only the
+  touched page and H2 sections
+
+    python -m benchmarks.bench_patch_engine --pages 200 500 --updates 12
+"""
+
+import argparse
+import logging
+import time
+
+from test_data import webpage_content_output_test_data
+from webchat.utils.utils import (
+    process_response_updates,
+    update_h2_section_content,
+    update_page_data,
+)
+
+SECTIONS = [
+    "Meta Title",
+    "Meta Description",
+    "Hero Title",
+    "Hero Text",
+    "Header",
+    "Leading Sentence",
+    "CTA Button",
+    "H2 Heading",
+    "H2 Content",
+]
+
+
+def build_site(page_count):
+    """page_count pages cycled from the test data, each with a unique name"""
+    templates = [
+        entry["pages"][0] for site in webpage_content_output_test_data for entry in site
+    ]
+    pages = []
+    for index in range(page_count):
+        page = dict(templates[index % len(templates)])
+        page["Page Name"] = f"Page {index}"
+        pages.append(page)
+    return pages
+
+
+def build_updates(count):
+    return [
+        {
+            "section": SECTIONS[k % len(SECTIONS)],
+            "index": k % 2,
+            "updated_text": f"Updated text {k}",
+        }
+        for k in range(count)
+    ]
+
+
+def legacy_process(pages_data, response, page_name):
+    updated_data = pages_data
+    for update in response:
+        section = update["section"]
+        if section in ("H2 Content", "H2 Heading"):
+            updated_data = update_h2_section_content(
+                updated_data,
+                page_name,
+                update["index"],
+                section,
+                update["updated_text"],
+            )
+        else:
+            updated_data = update_page_data(
+                updated_data, page_name, section, update["updated_text"]
+            )
+    return updated_data
+
+
+def time_per_call(func, pages, updates, page_name, iterations):
+    func(pages, updates, page_name)
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func(pages, updates, page_name)
+    return (time.perf_counter() - start) / iterations
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--pages", type=int, nargs="+", default=[100, 300, 600])
+    parser.add_argument("--updates", type=int, default=12)
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+    # The synthetic updates include fields some pages lack; keep the warnings for
+    # unresolved updates out of the output and the timings
+    logging.disable(logging.WARNING)
+
+    updates = build_updates(args.updates)
+    print(f"Updates per batch: {args.updates}, iterations: {args.iterations}")
+    print(f"{'pages':>6} {'legacy ms':>10} {'batched ms':>11} {'speedup':>8}")
+    for page_count in args.pages:
+        pages = build_site(page_count)
+        # Worst case for the linear scans: the last page of the site
+        page_name = pages[-1]["Page Name"]
+
+        legacy_result = legacy_process(pages, updates, page_name)
+        batched_result = process_response_updates(pages, updates, page_name)
+        if legacy_result != batched_result:
+            raise SystemExit(f"Results differ for {page_count} pages")
+
+        legacy = time_per_call(
+            legacy_process, pages, updates, page_name, args.iterations
+        )
+        batched = time_per_call(
+            process_response_updates, pages, updates, page_name, args.iterations
+        )
+        print(
+            f"{page_count:>6} {legacy * 1e3:>10.3f} {batched * 1e3:>11.3f} "
+            f"{legacy / batched:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+Report how many prompt tokens each registered chain spends, per message and per placeholder.
+
+Every page of every site in test_data is run through the same input preparation the
+workflow uses (extract_key_info, the section-scoped generation and guidelines context)
+and each chain's prompt is rendered with the result. For every chain the report gives
+the mean and max tokens of each message, of the static template text and of each
+placeholder value, so it is clear which input dominates a prompt.
+
+Nothing is sent to the LLM or downloaded. Token counts use tiktoken when the model's
+encoding is already in tiktoken's local cache, and the chars/token estimate otherwise;
+the report names the tokenizer used. Set
+WEBCHAT_PROMPT_CONTEXT_SLICING=0 to see the sizes without section-scoped context:
+
+    python -m scripts.analyze_prompt_tokens --section "Hero Text" --action rewrite-clarity
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+from collections import defaultdict
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("OPENAI_API_KEY", "unused")
+
+import webchat.core.chains.core_chains  # noqa: E402,F401
+import webchat.core.chains.guardrails_chains  # noqa: E402,F401
+from app.routers.api import page_titles  # noqa: E402
+from app.utils.constants import ACTION_QUESTIONS  # noqa: E402
+from test_data import combined_data, webpage_content_output_test_data  # noqa: E402
+from webchat.core.chains.registry import CHARS_PER_TOKEN, chain_specs  # noqa: E402
+from webchat.core.context import generation_context, guidelines_context  # noqa: E402
+from webchat.core.page_schema import resolve_section  # noqa: E402
+from webchat.core.token_usage import token_counter  # noqa: E402
+from webchat.settings import LLM_MODEL  # noqa: E402
+from webchat.utils.utils import extract_key_info  # noqa: E402
+
+
+async def page_inputs(payload_data, model_output, page_name, section, query):
+    """Every prompt variable, prepared the way the workflow prepares it for this page"""
+    main_output, left_panel, _, business_info = await extract_key_info(
+        payload_data, model_output, page_name
+    )
+    page = main_output[0] if main_output else {}
+    path = resolve_section(section)
+    text_to_change = page.get(path[0], "") if path and len(path) == 1 else ""
+
+    generation = generation_context(business_info, left_panel, main_output, section)
+    guidelines_payload, guidelines_output = guidelines_context(
+        payload_data, model_output, main_output, section
+    )
+    return {
+        "business_info": generation[0],
+        "left_panel_info": generation[1],
+        "current_output": generation[2],
+        "page_name": page_name,
+        "section": section,
+        "text_to_change": text_to_change,
+        "query": query,
+        "search_query_or_request": query,
+        "all_pages_names": page_titles(payload_data),
+        "website_output": main_output,
+        "payload_data": guidelines_payload,
+        "output": guidelines_output,
+    }
+
+
+def measure(prompt, inputs, count_tokens):
+    """{item: tokens} for one rendering: each message, the static template, each placeholder"""
+    values = {name: inputs.get(name, "") for name in prompt.input_variables}
+    sizes = {}
+    for index, message in enumerate(prompt.format_messages(**values)):
+        sizes[f"message {index} ({message.type})"] = count_tokens(message.content)
+    placeholders = {name: count_tokens(str(value)) for name, value in values.items()}
+    total = sum(sizes.values())
+    # A placeholder used more than once is counted once per use
+    templates = "".join(
+        getattr(getattr(message, "prompt", None), "template", "")
+        for message in prompt.messages
+    )
+    sizes["template"] = total - sum(
+        tokens * templates.count(f"{{{name}}}") for name, tokens in placeholders.items()
+    )
+    for name, tokens in placeholders.items():
+        sizes[f"{{{name}}}"] = tokens
+    sizes["total"] = total
+    return sizes
+
+
+def summarize(samples):
+    report = {}
+    for item in samples[0]:
+        values = [sample[item] for sample in samples]
+        report[item] = {"mean": sum(values) / len(values), "max": max(values)}
+    return report
+
+
+async def analyze(section, query, count_tokens):
+    samples = defaultdict(list)
+    for payload_data, model_output in zip(
+        combined_data, webpage_content_output_test_data
+    ):
+        for entry in model_output:
+            page_name = entry["pages"][0].get("Page Name", "")
+            inputs = await page_inputs(
+                payload_data, model_output, page_name, section, query
+            )
+            for name, (prompt, _, _) in chain_specs.items():
+                samples[name].append(measure(prompt, inputs, count_tokens))
+    return {name: summarize(chain_samples) for name, chain_samples in samples.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--section", default="Hero Text")
+    parser.add_argument(
+        "--action", default="rewrite-clarity", choices=sorted(ACTION_QUESTIONS)
+    )
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    count_tokens, method = token_counter(LLM_MODEL, CHARS_PER_TOKEN)
+    report = asyncio.run(
+        analyze(args.section, ACTION_QUESTIONS[args.action], count_tokens)
+    )
+    if args.json:
+        print(json.dumps({"tokenizer": method, "chains": report}, indent=2))
+        return
+
+    print(f"Token counts: {method}, section: {args.section}, action: {args.action}")
+    for name, items in report.items():
+        print(f"\n{name}")
+        print(f"  {'':32} {'mean':>8} {'max':>8}")
+        for item, sizes in items.items():
+            print(f"  {item:32} {sizes['mean']:>8.0f} {sizes['max']:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Check that every registered chain's prompt starts with a static, cacheable prefix.
+
+Provider-side prompt caching only applies to an exact prefix of the request, so the
+system message of each chain must not contain any per-request value: those go in the
+human message, after it. For every chain in the registry the prompt is formatted with
+two different sets of inputs; the script fails if the system message differs between
+them and reports how long the shared prefix is.
+
+Prefixes of at least 1024 tokens are the ones OpenAI caches. Token counts use tiktoken
+when the model's encoding is already in tiktoken's local cache, and the chars/token
+estimate otherwise; nothing is downloaded. The LLM is never called, so no real
+OPENAI_API_KEY is needed:
+
+    python -m scripts.check_prompt_prefixes
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("OPENAI_API_KEY", "unused")
+
+import webchat.core.chains.core_chains  # noqa: E402,F401
+import webchat.core.chains.guardrails_chains  # noqa: E402,F401
+from webchat.core.chains.registry import CHARS_PER_TOKEN, chain_specs  # noqa: E402
+from webchat.core.token_usage import token_counter  # noqa: E402
+from webchat.settings import LLM_MODEL  # noqa: E402
+
+# Shortest prefix OpenAI caches
+MIN_CACHED_TOKENS = 1024
+
+
+def render(prompt, marker):
+    """Messages of prompt formatted with a distinct value per input variable"""
+    values = {name: f"<{marker}:{name}>" for name in prompt.input_variables}
+    return [(m.type, m.content) for m in prompt.format_messages(**values)]
+
+
+def serialize(messages):
+    return "".join(f"{role}\n{content}\n" for role, content in messages)
+
+
+def common_prefix(a, b):
+    length = min(len(a), len(b))
+    for index in range(length):
+        if a[index] != b[index]:
+            return index
+    return length
+
+
+def check_chain(name, prompt, count_tokens):
+    """(ok, report line) for one registered chain"""
+    first, second = render(prompt, "a"), render(prompt, "b")
+    system_first = [content for role, content in first if role == "system"]
+    system_second = [content for role, content in second if role == "system"]
+    prefix = serialize(first)[: common_prefix(serialize(first), serialize(second))]
+    tokens = count_tokens(prefix)
+    total = count_tokens(serialize(first))
+
+    ok = system_first == system_second
+    status = "ok" if ok else "SYSTEM MESSAGE VARIES"
+    cached = "cacheable" if tokens >= MIN_CACHED_TOKENS else "too short to cache"
+    return ok, (
+        f"{name:32} prefix {len(prefix):>6} chars {tokens:>6} tokens "
+        f"({tokens / max(total, 1):>4.0%} of template) {cached:18} {status}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.parse_args()
+
+    count_tokens, method = token_counter(LLM_MODEL, CHARS_PER_TOKEN)
+    print(f"Token counts: {method}")
+    failed = []
+    for name, (prompt, _, _) in chain_specs.items():
+        ok, line = check_chain(name, prompt, count_tokens)
+        print(line)
+        if not ok:
+            failed.append(name)
+
+    if failed:
+        print(f"System messages depend on request inputs: {', '.join(failed)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
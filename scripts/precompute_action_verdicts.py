@@ -0,0 +1,102 @@
+"""
+Generate app/utils/action_verdicts.json by running the real guardrail validators once for
+every preset action in ACTION_QUESTIONS against every content section.
+
+Each action/section pair is validated on a representative page from test_data, once
+with the copyright check off (copy == "yes") and once with it on (copy == "no"). The
+resulting verdicts let /api/ask-ai skip the LLM validators for preset actions.
+
+Needs OPENAI_API_KEY. Re-run whenever ACTION_QUESTIONS or the guardrail prompts change:
+
+    python -m scripts.precompute_action_verdicts
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.routers.api import get_page_titles_flexible  # noqa: E402
+from app.utils.constants import ACTION_QUESTIONS, ACTION_VERDICTS_PATH  # noqa: E402
+from test_data import combined_data, webpage_content_output_test_data  # noqa: E402
+from webchat.core.page_schema import SECTION_KEYS  # noqa: E402
+from webchat.utils.utils import extract_key_info  # noqa: E402
+from webchat.workflow import run_guardrails  # noqa: E402
+
+# Section kinds as returned by identify_content_section, with the page field they need
+SECTION_FIELDS = {
+    section: "h2_sections" if section.startswith("H2") else key
+    for section, key in SECTION_KEYS.items()
+    if section not in ("Page Name", "H2 Sections")
+}
+
+
+def find_sample(field):
+    """First (set index, page name) whose page has the given field"""
+    for set_index, site in enumerate(webpage_content_output_test_data):
+        for entry in site:
+            page = entry["pages"][0]
+            if page.get(field):
+                return set_index, page["Page Name"]
+    return None
+
+
+async def verdict_for(action_type, section_kind, copy_value):
+    sample = find_sample(SECTION_FIELDS[section_kind])
+    if sample is None:
+        return None
+    set_index, page_name = sample
+    payload_data = combined_data[set_index]
+    model_output = webpage_content_output_test_data[set_index]
+    main_output, _, _, _ = await extract_key_info(payload_data, model_output, page_name)
+
+    # Validators see the section the way identify_content_section reports it
+    section = section_kind
+    if section_kind.startswith("H2"):
+        section = f"{section_kind} (Section 1)"
+    elif section_kind == "Image Recommendation":
+        section = f"{section_kind} 1"
+
+    rejection = await run_guardrails(
+        payload_data,
+        model_output,
+        main_output,
+        copy_value,
+        ACTION_QUESTIONS[action_type],
+        section,
+        get_page_titles_flexible(combined_data, set_index),
+    )
+    if rejection is None:
+        return {"score": 1, "reason": ""}
+    return {"score": 0, "reason": rejection}
+
+
+async def main(output_path):
+    verdicts = {}
+    for action_type in ACTION_QUESTIONS:
+        for section_kind in SECTION_FIELDS:
+            for copy_value in ("yes", "no"):
+                verdict = await verdict_for(action_type, section_kind, copy_value)
+                if verdict is None:
+                    continue
+                verdicts.setdefault(action_type, {}).setdefault(section_kind, {})[
+                    copy_value
+                ] = verdict
+                print(
+                    f"{action_type:20} {section_kind:22} copy={copy_value:3} {verdict}"
+                )
+
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump(verdicts, f, indent=4, ensure_ascii=False)
+        f.write("\n")
+    print(f"Wrote {output_path}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--output", default=ACTION_VERDICTS_PATH)
+    args = parser.parse_args()
+    asyncio.run(main(args.output))
@@ -0,0 +1,264 @@
+"""
+Process-wide admission control for LLM calls.
+
+Every chain invocation passes through one AdmissionController before it reaches the
+provider. The controller:
+
+- enforces requests-per-minute and tokens-per-minute budgets with token buckets,
+- caps in-flight calls with an AIMD concurrency limit: the limit grows by about one
+  slot per limit's worth of successful calls and is cut multiplicatively when the provider
+  returns 429 or latency goes above the target,
+- queues waiting callers in FIFO order, so a burst drains fairly instead of every
+  request hitting the provider at once and retrying on 429s.
+"""
+
+import asyncio
+import logging
+import random
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, Dict, Optional
+
+from webchat.core.metrics import Gauge, add_collector
+from webchat.settings import (
+    LLM_RPM_LIMIT,
+    LLM_TPM_LIMIT,
+    LLM_INITIAL_CONCURRENCY,
+    LLM_MIN_CONCURRENCY,
+    LLM_MAX_CONCURRENCY,
+    LLM_LATENCY_TARGET,
+    LLM_BACKOFF_FACTOR,
+)
+
+logger = logging.getLogger(__name__)
+
+# Minimum seconds between two multiplicative decreases of the concurrency limit
+DECREASE_COOLDOWN = 1.0
+
+
+class TokenBucket:
+    """
+    Per-minute budget refilled continuously. A capacity of 0 disables the bucket.
+    Waiters are served strictly in arrival order.
+    """
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    def refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, amount: float) -> float:
+        """Take amount from the bucket, waiting as needed; returns the time spent waiting"""
+        if self.capacity <= 0:
+            return 0.0
+        # A single call larger than the whole budget waits for a full bucket
+        amount = min(amount, self.capacity)
+        waited = 0.0
+        async with self.lock:
+            self.refill()
+            while self.tokens < amount:
+                delay = (amount - self.tokens) / self.rate
+                await asyncio.sleep(delay)
+                waited += delay
+                self.refill()
+            self.tokens -= amount
+        return waited
+
+
+class AdaptiveConcurrencyLimiter:
+    """AIMD concurrency limit with a FIFO wait queue"""
+
+    def __init__(
+        self,
+        initial: int,
+        minimum: int,
+        maximum: int,
+        latency_target: float,
+        backoff_factor: float,
+    ):
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.limit = float(min(max(initial, self.minimum), self.maximum))
+        self.latency_target = latency_target
+        self.backoff_factor = backoff_factor
+        self.in_flight = 0
+        self.waiters: deque = deque()
+        self.last_decrease = 0.0
+
+    def has_capacity(self) -> bool:
+        return self.in_flight < int(self.limit)
+
+    async def acquire(self) -> None:
+        if self.has_capacity() and not self.waiters:
+            self.in_flight += 1
+            return
+        waiter = asyncio.get_running_loop().create_future()
+        self.waiters.append(waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just before the cancellation landed
+                self.release_slot()
+            else:
+                self.waiters.remove(waiter)
+            raise
+
+    def release_slot(self) -> None:
+        self.in_flight -= 1
+        self.wake_waiters()
+
+    def wake_waiters(self) -> None:
+        while self.waiters and self.has_capacity():
+            waiter = self.waiters.popleft()
+            if not waiter.done():
+                self.in_flight += 1
+                waiter.set_result(None)
+
+    def release(self, latency: float, throttled: bool) -> None:
+        if throttled or (self.latency_target > 0 and latency > self.latency_target):
+            # Cut at most once per cooldown so one burst of 429s does not collapse the limit
+            now = time.monotonic()
+            if now - self.last_decrease >= DECREASE_COOLDOWN:
+                self.limit = max(self.minimum, self.limit * self.backoff_factor)
+                self.last_decrease = now
+                cause = "429 from provider" if throttled else f"latency {latency:.1f}s"
+                logger.warning(
+                    f"LLM concurrency limit lowered to {int(self.limit)} ({cause})"
+                )
+        else:
+            self.limit = min(self.maximum, self.limit + 1.0 / self.limit)
+        self.release_slot()
+
+
+def is_rate_limit_error(error: BaseException) -> bool:
+    return (
+        getattr(error, "status_code", None) == 429
+        or type(error).__name__ == "RateLimitError"
+    )
+
+
+def is_retryable_error(error: BaseException) -> bool:
+    """429s, 5xx responses, timeouts and dropped connections are worth another attempt"""
+    status_code = getattr(error, "status_code", None)
+    return (
+        is_rate_limit_error(error)
+        or (isinstance(status_code, int) and status_code >= 500)
+        or type(error).__name__ in ("APIConnectionError", "APITimeoutError")
+    )
+
+
+def retry_delay(attempt: int) -> float:
+    """Exponential backoff with full jitter, capped at 20 seconds"""
+    return random.uniform(0, min(20.0, 0.5 * 2**attempt))
+
+
+class AdmissionController:
+    def __init__(
+        self,
+        rpm_limit: float = LLM_RPM_LIMIT,
+        tpm_limit: float = LLM_TPM_LIMIT,
+        initial_concurrency: int = LLM_INITIAL_CONCURRENCY,
+        min_concurrency: int = LLM_MIN_CONCURRENCY,
+        max_concurrency: int = LLM_MAX_CONCURRENCY,
+        latency_target: float = LLM_LATENCY_TARGET,
+        backoff_factor: float = LLM_BACKOFF_FACTOR,
+    ):
+        self.requests = TokenBucket(rpm_limit)
+        self.tokens = TokenBucket(tpm_limit)
+        self.concurrency = AdaptiveConcurrencyLimiter(
+            initial_concurrency,
+            min_concurrency,
+            max_concurrency,
+            latency_target,
+            backoff_factor,
+        )
+        self.admitted = 0
+        self.throttled = 0
+        self.queue_wait_total = 0.0
+
+    @asynccontextmanager
+    async def admit(self, estimated_tokens: int):
+        """Wait for rate budget and a concurrency slot, then run the wrapped LLM call"""
+        queued_at = time.monotonic()
+        await self.requests.acquire(1)
+        await self.tokens.acquire(estimated_tokens)
+        await self.concurrency.acquire()
+        started = time.monotonic()
+        self.admitted += 1
+        self.queue_wait_total += started - queued_at
+
+        outcome = "ok"
+        try:
+            yield
+        except asyncio.CancelledError:
+            outcome = "cancelled"
+            raise
+        except BaseException as e:
+            outcome = "throttled" if is_rate_limit_error(e) else "error"
+            if outcome == "throttled":
+                self.throttled += 1
+            raise
+        finally:
+            if outcome in ("ok", "throttled"):
+                self.concurrency.release(
+                    time.monotonic() - started, outcome == "throttled"
+                )
+            else:
+                # Cancellations and other failures say nothing about provider capacity
+                self.concurrency.release_slot()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "concurrency_limit": int(self.concurrency.limit),
+            "in_flight": self.concurrency.in_flight,
+            "queued": len(self.concurrency.waiters),
+            "admitted": self.admitted,
+            "throttled": self.throttled,
+            "avg_queue_wait_seconds": (
+                self.queue_wait_total / self.admitted if self.admitted else 0.0
+            ),
+        }
+
+
+admission_controller: Optional[AdmissionController] = None
+
+
+def get_admission_controller() -> AdmissionController:
+    """Return the process-wide controller, created lazily inside the running event loop"""
+    global admission_controller
+    if admission_controller is None:
+        admission_controller = AdmissionController()
+    return admission_controller
+
+
+admission_gauges = {
+    "concurrency_limit": Gauge(
+        "webchat_llm_concurrency_limit", "Current AIMD limit on in-flight LLM calls"
+    ),
+    "in_flight": Gauge(
+        "webchat_llm_admitted_in_flight", "LLM calls holding an admission slot"
+    ),
+    "queued": Gauge(
+        "webchat_llm_admission_queued", "LLM calls waiting for an admission slot"
+    ),
+}
+
+
+def collect_admission_metrics() -> None:
+    if admission_controller is None:
+        return
+    stats = admission_controller.stats()
+    for key, gauge in admission_gauges.items():
+        gauge.set(value=stats[key])
+
+
+add_collector(collect_admission_metrics)
@@ -2,16 +2,18 @@ from webchat.core.prompts.core_prompts import website_update_prompt
 from webchat.core.pydantic_classes.guardrails_classes import (
     SuggestedOutputs,
 )
-
-from dotenv import load_dotenv
-
-from langchain_openai import ChatOpenAI
+from webchat.core.chains.registry import register_chain, ainvoke_chain, astream_chain
+from webchat.core.context import generation_context
 import json
-from typing import Any
-
-load_dotenv()
+from typing import Any, AsyncIterator, Dict
 
-llm = ChatOpenAI(model="gpt-4.1", temperature=0, use_responses_api=True, max_retries=3)
+register_chain("updated_website", website_update_prompt, SuggestedOutputs)
+# JSON schema instead of the pydantic class so partial outputs can be streamed
+register_chain(
+    "updated_website_stream",
+    website_update_prompt,
+    SuggestedOutputs.model_json_schema(),
+)
 
 
 async def return_updated_wesite(
@@ -24,8 +26,9 @@ async def return_updated_wesite(
     section,
     all_pages_names,
 ) -> Any:
-    llmr = llm.with_structured_output(SuggestedOutputs)
-    updated_output_chain = website_update_prompt | llmr
+    business_info, left_panel_info, current_output = generation_context(
+        business_info, left_panel_info, current_output, section
+    )
     input_data = {
         "business_info": business_info,
         "left_panel_info": left_panel_info,
@@ -36,5 +39,34 @@ async def return_updated_wesite(
         "section": section,
         "all_pages_names": all_pages_names,
     }
-    result = await updated_output_chain.ainvoke(input_data)
+    result = await ainvoke_chain("updated_website", input_data)
     return [json.loads(result.model_dump_json())]
+
+
+async def stream_updated_wesite(
+    business_info,
+    left_panel_info,
+    query,
+    current_output,
+    page,
+    text_to_change,
+    section,
+    all_pages_names,
+) -> AsyncIterator[Dict[str, Any]]:
+    """Same call as return_updated_wesite, yielding the partially parsed SuggestedOutputs dict"""
+    business_info, left_panel_info, current_output = generation_context(
+        business_info, left_panel_info, current_output, section
+    )
+    input_data = {
+        "business_info": business_info,
+        "left_panel_info": left_panel_info,
+        "current_output": current_output,
+        "query": query,
+        "text_to_change": text_to_change,
+        "page_name": page,
+        "section": section,
+        "all_pages_names": all_pages_names,
+    }
+    async for partial in astream_chain("updated_website_stream", input_data):
+        if isinstance(partial, dict):
+            yield partial
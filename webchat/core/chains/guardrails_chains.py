@@ -1,42 +1,62 @@
-from langchain_openai import ChatOpenAI
 from webchat.core.prompts.guardrails_prompts import (
     query_checker_prompt,
     copyright_check_prompt,
     guidelines_guardrails_prompt,
+    combined_guardrails_prompt,
+    combined_guardrails_copyright_prompt,
 )
-from webchat.core.pydantic_classes.guardrails_classes import QueryValidator
+from webchat.core.pydantic_classes.guardrails_classes import (
+    QueryValidator,
+    CombinedGuardrailValidator,
+)
+from webchat.core.chains.registry import register_chain, ainvoke_chain
+from webchat.core.verdict_cache import verdict_cache, normalize_query, content_hash
 import json
 from typing import Any
 
-
-from dotenv import load_dotenv
-
-load_dotenv()
 a = 2
-llm = ChatOpenAI(model="gpt-4.1", temperature=0, use_responses_api=True, max_retries=3)
+
+register_chain("query_validator", query_checker_prompt, QueryValidator)
+register_chain("copyright_validator", copyright_check_prompt, QueryValidator)
+register_chain("guidelines_validator", guidelines_guardrails_prompt, QueryValidator)
+register_chain(
+    "combined_guardrails", combined_guardrails_prompt, CombinedGuardrailValidator
+)
+register_chain(
+    "combined_guardrails_copyright",
+    combined_guardrails_copyright_prompt,
+    CombinedGuardrailValidator,
+)
 
 
 async def return_query_validator(search_query: str) -> Any:
-    llm_structured = llm.with_structured_output(QueryValidator)
-    query_validator_chain = query_checker_prompt | llm_structured
+    # The query check sees nothing but the query itself
+    cache_key = ("query", normalize_query(search_query))
+    cached = verdict_cache.get(cache_key)
+    if cached is not None:
+        return cached
     input_data = {"search_query_or_request": search_query}
-    result = await query_validator_chain.ainvoke(input_data)
-    return json.loads(result.model_dump_json())
+    result = await ainvoke_chain("query_validator", input_data)
+    verdict = json.loads(result.model_dump_json())
+    verdict_cache.set(cache_key, verdict)
+    return verdict
 
 
 async def return_query_validator_copyright(current_output, query) -> Any:
-    llm_structured = llm.with_structured_output(QueryValidator)
-    query_validator_chain = copyright_check_prompt | llm_structured
+    cache_key = ("copyright", normalize_query(query), content_hash(current_output))
+    cached = verdict_cache.get(cache_key)
+    if cached is not None:
+        return cached
     input_data = {"website_output": current_output, "query": query}
-    result = await query_validator_chain.ainvoke(input_data)
-    return json.loads(result.model_dump_json())
+    result = await ainvoke_chain("copyright_validator", input_data)
+    verdict = json.loads(result.model_dump_json())
+    verdict_cache.set(cache_key, verdict)
+    return verdict
 
 
 async def return_guidelines_validator(
     query, section, payload_data, output, all_pages_names
 ) -> Any:
-    llm_structured = llm.with_structured_output(QueryValidator)
-    query_validator_chain = guidelines_guardrails_prompt | llm_structured
     input_data = {
         "query": query,
         "section": section,
@@ -44,5 +64,58 @@ async def return_guidelines_validator(
         "output": output,
         "all_pages_names": all_pages_names,
     }
-    result = await query_validator_chain.ainvoke(input_data)
-    return json.loads(result.model_dump_json())
+    cache_key = (
+        "guidelines",
+        normalize_query(query),
+        section,
+        content_hash(payload_data, output, all_pages_names),
+    )
+    cached = verdict_cache.get(cache_key)
+    if cached is not None:
+        return cached
+    result = await ainvoke_chain("guidelines_validator", input_data)
+    verdict = json.loads(result.model_dump_json())
+    verdict_cache.set(cache_key, verdict)
+    return verdict
+
+
+async def return_combined_guardrails_validator(
+    query, section, payload_data, output, all_pages_names, current_output=None
+) -> Any:
+    """
+    Run the query, guidelines and (when current_output is given) copyright checks in one call
+    """
+    input_data = {
+        "search_query_or_request": query,
+        "query": query,
+        "section": section,
+        "payload_data": payload_data,
+        "output": output,
+        "all_pages_names": all_pages_names,
+    }
+    cache_key = (
+        "combined",
+        normalize_query(query),
+        section,
+        content_hash(payload_data, output, all_pages_names, current_output),
+    )
+    cached = verdict_cache.get(cache_key)
+    if cached is not None:
+        return cached
+    chain_name = "combined_guardrails"
+    if current_output is not None:
+        chain_name = "combined_guardrails_copyright"
+        input_data["website_output"] = current_output
+    result = json.loads((await ainvoke_chain(chain_name, input_data)).model_dump_json())
+
+    # Derive the overall verdict from the per-check scores so the two can never disagree
+    checks = ["query", "guidelines"]
+    if current_output is not None:
+        checks.insert(1, "copyright")
+    result["score"], result["reason"] = 1, ""
+    for check in checks:
+        if result.get(f"{check}_score") == 0:
+            result["score"], result["reason"] = 0, result.get(f"{check}_reason", "")
+            break
+    verdict_cache.set(cache_key, result)
+    return result
@@ -0,0 +1,235 @@
+"""
+Registry of prebuilt structured-output chains.
+
+Each chain module registers its prompt and output schema once at import. The runnable
+(prompt | llm.with_structured_output(schema)) is built on first use and reused for every
+request after that, so the JSON schema and tool binding are not regenerated per call.
+
+Invoked chains return the raw model message alongside the parsed output so the token
+usage the provider reports can be recorded (see webchat/core/token_usage.py). Calls go
+through the backend chosen by WEBCHAT_LLM_MODE (see webchat/core/llm_backend.py), are
+timed per chain (see webchat/core/metrics.py) and stop at the request's deadline or
+when the client disconnects (see webchat/core/deadline.py).
+"""
+
+import asyncio
+import json
+import logging
+from typing import Any, AsyncIterator, Dict, Tuple
+
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.runnables import Runnable
+
+from webchat.core.admission import (
+    get_admission_controller,
+    is_retryable_error,
+    retry_delay,
+)
+from webchat.core import llm_backend
+from webchat.core.deadline import (
+    DeadlineExceeded,
+    cancel_reason,
+    check_deadline,
+    remaining,
+    within_deadline,
+)
+from webchat.core.hedging import hedged
+from webchat.core.llm import get_llm
+from webchat.core.metrics import calls_cancelled, chain_span, tokens_saved
+from webchat.core.token_usage import reported_usage, token_usage
+from webchat.settings import LLM_MAX_RETRIES, LLM_COMPLETION_TOKEN_ESTIMATE
+
+logger = logging.getLogger(__name__)
+
+# name -> (prompt, schema, llm or None for the shared client)
+chain_specs: Dict[str, Tuple[ChatPromptTemplate, Any, Any]] = {}
+# Keyed by (name, include_raw): invoked chains return the raw message too, streamed
+# chains only the parsed output
+built_chains: Dict[Tuple[str, bool], Runnable] = {}
+template_sizes: Dict[str, int] = {}
+
+# Rough characters-per-token ratio used for admission budgeting
+CHARS_PER_TOKEN = 4
+
+
+def register_chain(name: str, prompt: ChatPromptTemplate, schema, llm=None) -> None:
+    """
+    Register a prompt/schema pair under name; any previously built runnable is dropped.
+    Without llm the chain uses the shared client that get_llm returns when it is built.
+    """
+    chain_specs[name] = (prompt, schema, llm)
+    built_chains.pop((name, True), None)
+    built_chains.pop((name, False), None)
+    template_sizes[name] = sum(
+        len(getattr(getattr(message, "prompt", None), "template", ""))
+        for message in prompt.messages
+    )
+
+
+def build_chain(name: str, include_raw: bool = True) -> Runnable:
+    """Build the runnable for a registered chain without caching it"""
+    prompt, schema, llm = chain_specs[name]
+    if llm is None:
+        llm = get_llm()
+    return prompt | llm.with_structured_output(schema, include_raw=include_raw)
+
+
+def get_chain(name: str, include_raw: bool = True) -> Runnable:
+    """Return the cached runnable for name, building it on first use"""
+    chain = built_chains.get((name, include_raw))
+    if chain is None:
+        chain = built_chains[(name, include_raw)] = build_chain(name, include_raw)
+    return chain
+
+
+def build_all_chains() -> None:
+    """Build every registered chain up front, e.g. at application startup"""
+    for name in chain_specs:
+        get_chain(name)
+        get_chain(name, include_raw=False)
+
+
+def clear_built_chains() -> None:
+    """Drop the built runnables, e.g. once the client they were built with is closed"""
+    built_chains.clear()
+
+
+def prompt_characters(name: str, input_data: Dict[str, Any]) -> int:
+    return template_sizes.get(name, 0) + sum(
+        len(str(value)) for value in input_data.values()
+    )
+
+
+def estimate_tokens(name: str, input_data: Dict[str, Any]) -> int:
+    """Cheap token estimate (prompt plus expected completion) for rate budgeting"""
+    return (
+        prompt_characters(name, input_data) // CHARS_PER_TOKEN
+        + LLM_COMPLETION_TOKEN_ESTIMATE
+    )
+
+
+def record_usage(name: str, input_data: Dict[str, Any], output: Dict[str, Any]) -> None:
+    """Record the usage reported with an include_raw output, or estimate it"""
+    usage = reported_usage(output.get("raw"))
+    if usage is not None:
+        prompt_tokens, completion_tokens, cached_tokens = usage
+        token_usage.record(name, prompt_tokens, completion_tokens, cached_tokens)
+        return
+    parsed = output.get("parsed")
+    if hasattr(parsed, "model_dump_json"):
+        parsed = parsed.model_dump_json()
+    token_usage.record(
+        name,
+        prompt_characters(name, input_data) // CHARS_PER_TOKEN,
+        len(str(parsed)) // CHARS_PER_TOKEN,
+        estimated=True,
+    )
+
+
+def record_saved_tokens(
+    name: str, input_data: Dict[str, Any], sent: bool, completion_chars: int = 0
+) -> None:
+    """
+    Count the tokens a cancelled call did not spend: the whole estimate while it was
+    still queued, the rest of the expected completion once it had been sent
+    """
+    completion = max(
+        0, LLM_COMPLETION_TOKEN_ESTIMATE - completion_chars // CHARS_PER_TOKEN
+    )
+    if not sent:
+        completion += prompt_characters(name, input_data) // CHARS_PER_TOKEN
+    reason = cancel_reason()
+    tokens_saved.inc(name, reason, amount=completion)
+    calls_cancelled.inc(name, reason, "sent" if sent else "queued")
+
+
+async def ainvoke_chain(name: str, input_data: Dict[str, Any]) -> Any:
+    """
+    Invoke a registered chain through the admission controller, retrying transient
+    errors, within the current request's deadline. Slow calls of chains in
+    WEBCHAT_HEDGED_CHAINS are hedged (see webchat/core/hedging.py).
+    """
+    with chain_span(name):
+        prompt, schema, _ = chain_specs[name]
+        controller = get_admission_controller()
+        estimated_tokens = estimate_tokens(name, input_data)
+        attempt = 0
+        while True:
+            sent = False
+
+            async def call():
+                nonlocal sent
+                async with controller.admit(estimated_tokens):
+                    sent = True
+                    return await llm_backend.invoke(
+                        name,
+                        prompt,
+                        schema,
+                        input_data,
+                        lambda: get_chain(name).ainvoke(input_data),
+                    )
+
+            try:
+                output = await within_deadline(hedged(name, call), f"chain {name}")
+                record_usage(name, input_data, output)
+                if output.get("parsing_error") is not None:
+                    raise output["parsing_error"]
+                return output["parsed"]
+            except (asyncio.CancelledError, DeadlineExceeded):
+                record_saved_tokens(name, input_data, sent)
+                raise
+            except Exception as e:
+                if attempt >= LLM_MAX_RETRIES or not is_retryable_error(e):
+                    raise
+                delay = retry_delay(attempt)
+                left = remaining()
+                if left is not None and delay >= left:
+                    # The retry could not finish before the deadline
+                    raise
+                attempt += 1
+                logger.warning(
+                    f"Chain {name} failed with {type(e).__name__}, retry {attempt} in {delay:.1f}s"
+                )
+                await asyncio.sleep(delay)
+
+
+async def astream_chain(name: str, input_data: Dict[str, Any]) -> AsyncIterator[Any]:
+    """
+    Stream partial outputs of a registered chain through the admission controller. The
+    request's deadline is checked before the call is sent and between chunks.
+
+    Register streaming chains with a JSON schema dict rather than a pydantic class so the
+    parser yields progressively completed dicts. Streams are not retried: a retry after
+    partial output has been sent to the client would duplicate it.
+    """
+    with chain_span(name):
+        prompt, schema, _ = chain_specs[name]
+        controller = get_admission_controller()
+        last_chunk = None
+        sent = False
+        try:
+            check_deadline(f"chain {name}")
+            async with controller.admit(estimate_tokens(name, input_data)):
+                check_deadline(f"chain {name}")
+                sent = True
+                async for chunk in llm_backend.stream(
+                    name,
+                    prompt,
+                    schema,
+                    input_data,
+                    lambda: get_chain(name, include_raw=False).astream(input_data),
+                ):
+                    last_chunk = chunk
+                    yield chunk
+                    check_deadline(f"the rest of chain {name}")
+        except (asyncio.CancelledError, GeneratorExit, DeadlineExceeded):
+            streamed = len(json.dumps(last_chunk, default=str)) if last_chunk else 0
+            record_saved_tokens(name, input_data, sent, streamed)
+            raise
+        # The parser drops the usage metadata, so streamed calls are estimated
+        token_usage.record(
+            name,
+            prompt_characters(name, input_data) // CHARS_PER_TOKEN,
+            len(json.dumps(last_chunk, default=str)) // CHARS_PER_TOKEN,
+            estimated=True,
+        )
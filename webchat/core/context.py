@@ -0,0 +1,186 @@
+"""
+Section-scoped prompt context.
+
+The generation and guidelines prompts used to receive the whole page (or the whole
+site), every left-panel entry and all business info, whatever section was being edited.
+This module cuts that down to what a section's prompts need:
+
+- the edited field plus the fields read alongside it (see SECTION_NEIGHBOURS),
+- for an H2 section, the edited block and PROMPT_CONTEXT_H2_NEIGHBOURS blocks on each
+  side; other blocks keep only their heading, so list positions (the index the model
+  returns) do not change,
+- the business info and the page's own left-panel entry.
+
+If the slice is still above PROMPT_CONTEXT_TOKEN_BUDGET, distant H2 headings go first,
+then neighbour fields, then long free-text values are shortened. The edited field is
+never cut. Sections that cannot be resolved get the whole page, as before.
+"""
+
+import logging
+from typing import Any, Dict, List, NamedTuple
+
+from webchat.core.chains.registry import CHARS_PER_TOKEN
+from webchat.core.documents import payload_index
+from webchat.core.page_schema import SECTION_KEYS, resolve_section, section_kind
+from webchat.settings import (
+    PROMPT_CONTEXT_SLICING,
+    PROMPT_CONTEXT_TOKEN_BUDGET,
+    PROMPT_CONTEXT_H2_NEIGHBOURS,
+)
+
+logger = logging.getLogger(__name__)
+
+# Fields read alongside each section (by identify_content_section name)
+SECTION_NEIGHBOURS = {
+    "Meta Title": ("Meta Description",),
+    "Meta Description": ("Meta Title",),
+    "Hero Title": ("Hero Text", "Hero CTA"),
+    "Hero Text": ("Hero Title", "Hero CTA"),
+    "Hero CTA": ("Hero Title", "Hero Text"),
+    "H1 Title": ("H1 Content",),
+    "H1 Content": ("H1 Title",),
+    "Header": ("Leading Sentence", "CTA Button"),
+    "Leading Sentence": ("Header", "CTA Button"),
+    "CTA Button": ("Header", "Leading Sentence"),
+    "Image Recommendation": ("Hero Title", "H1 Title"),
+}
+
+# Shortest a free-text value is cut to when the budget forces it
+MIN_VALUE_CHARS = 200
+
+
+class PromptContext(NamedTuple):
+    business_info: Dict[str, Any]
+    left_panel: Dict[str, Any]
+    page: Dict[str, Any]
+
+
+def count_tokens(*values: Any) -> int:
+    """Same chars/token estimate the admission controller budgets with"""
+    return sum(len(str(value)) for value in values) // CHARS_PER_TOKEN
+
+
+def target_of(section: str):
+    """(top-level key, H2 index or None) of the edited field, or None if unknown"""
+    path = resolve_section(section) if section else None
+    if path is None:
+        return None
+    if path[0] == "h2_sections" and len(path) == 3:
+        return "h2_sections", path[1]
+    return path[0], None
+
+
+def neighbour_keys(section: str) -> List[str]:
+    names = SECTION_NEIGHBOURS.get(section_kind(section), ())
+    return [SECTION_KEYS[name] for name in names]
+
+
+def slice_h2_sections(sections: List[Any], index: int, neighbours: int):
+    """
+    The edited block and neighbours blocks on each side in full, only the heading of
+    the rest; with neighbours < 0 the other blocks are left empty
+    """
+    sliced = []
+    for i, block in enumerate(sections):
+        if abs(i - index) <= max(neighbours, 0) or not isinstance(block, dict):
+            sliced.append(block)
+        elif neighbours < 0:
+            sliced.append({})
+        else:
+            heading = block.get("H2 Heading") or block.get("H2_Heading")
+            sliced.append({"H2 Heading": heading} if heading else {})
+    return sliced
+
+
+def slice_page(page, target, neighbours, h2_neighbours):
+    """Page Name, the edited field and (optionally) its neighbours"""
+    key, h2_index = target
+    sliced = {"Page Name": page.get("Page Name")}
+    for name in [key] + (neighbours or []):
+        if name in page:
+            sliced[name] = page[name]
+    if h2_index is not None and isinstance(page.get("h2_sections"), list):
+        sliced["h2_sections"] = slice_h2_sections(
+            page["h2_sections"], h2_index, h2_neighbours
+        )
+    return sliced
+
+
+def shorten_values(data: Dict[str, Any], max_chars: int) -> Dict[str, Any]:
+    """Copy of data with string values longer than max_chars cut"""
+    shortened = {}
+    for key, value in data.items():
+        if isinstance(value, str) and len(value) > max_chars:
+            value = value[:max_chars].rstrip() + " ..."
+        shortened[key] = value
+    return shortened
+
+
+def build_prompt_context(
+    business_info: Dict[str, Any],
+    left_panel: Dict[str, Any],
+    page: Dict[str, Any],
+    section: str,
+    budget: int = PROMPT_CONTEXT_TOKEN_BUDGET,
+    h2_neighbours: int = PROMPT_CONTEXT_H2_NEIGHBOURS,
+) -> PromptContext:
+    """Minimal context for editing section of page, fitted to budget tokens"""
+    target = target_of(section)
+    if target is None or target[0] not in page:
+        return PromptContext(business_info, left_panel, page)
+
+    neighbours = neighbour_keys(section)
+    # Cheapest cut first; the last step keeps only the edited field and its H2 block
+    for page_neighbours, page_h2_neighbours in (
+        (neighbours, h2_neighbours),
+        (neighbours, -1),
+        ([], -1),
+    ):
+        sliced = slice_page(page, target, page_neighbours, page_h2_neighbours)
+        if count_tokens(business_info, left_panel, sliced) <= budget:
+            return PromptContext(business_info, left_panel, sliced)
+
+    values = list(business_info.values()) + list(left_panel.values())
+    max_chars = max([len(v) for v in values if isinstance(v, str)] or [0])
+    while max_chars > MIN_VALUE_CHARS:
+        max_chars = max(MIN_VALUE_CHARS, max_chars // 2)
+        shortened_business = shorten_values(business_info, max_chars)
+        shortened_panel = shorten_values(left_panel, max_chars)
+        if count_tokens(shortened_business, shortened_panel, sliced) <= budget:
+            return PromptContext(shortened_business, shortened_panel, sliced)
+
+    logger.warning(
+        f"Prompt context for {section} is over the {budget} token budget after slicing"
+    )
+    return PromptContext(
+        shorten_values(business_info, MIN_VALUE_CHARS),
+        shorten_values(left_panel, MIN_VALUE_CHARS),
+        sliced,
+    )
+
+
+def generation_context(business_info, left_panel_info, current_output, section):
+    """
+    Inputs of return_updated_wesite, sliced for section. current_output is the page's
+    "pages" list as returned by extract_key_info.
+    """
+    if not PROMPT_CONTEXT_SLICING or not current_output:
+        return business_info, left_panel_info, current_output
+    context = build_prompt_context(
+        business_info, left_panel_info or {}, current_output[0], section
+    )
+    return context.business_info, context.left_panel, [context.page]
+
+
+def guidelines_context(payload_data, model_output, main_output, section):
+    """
+    (payload_data, output) for the guidelines check: the business info with only this
+    page's left-panel entry, and the sliced page instead of every page of the site
+    """
+    if not PROMPT_CONTEXT_SLICING or not main_output:
+        return payload_data, model_output
+    page = main_output[0]
+    index = payload_index(payload_data)
+    left_panel = index.left_panels.get(str(page.get("Page Name", "")).lower(), {})
+    context = build_prompt_context(index.business_info, left_panel, page, section)
+    return {**context.business_info, "pages": [context.left_panel]}, [context.page]
@@ -0,0 +1,188 @@
+"""
+Request deadlines and client-disconnect cancellation for LLM work.
+
+The API layer opens a RequestBudget for each request. Its deadline comes from the
+X-Request-Deadline header (seconds the client is willing to wait) or the endpoint's
+default, whichever is shorter. The budget lives in a context variable, so the guardrail
+and generation tasks the request starts share it:
+
+- ainvoke_chain runs each attempt within the time left and fails with DeadlineExceeded
+  instead of starting a call the client will not wait for
+- astream_chain checks the deadline before admission and between chunks
+- run_until_disconnect and stream_until_disconnect cancel the request's work as soon
+  as the ASGI server reports that the client went away
+
+Chain calls that end this way count the tokens they did not spend in
+webchat_llm_tokens_saved_total, labelled with the budget's cancel reason.
+"""
+
+import asyncio
+import time
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Mapping, Optional
+
+DEADLINE_HEADER = "X-Request-Deadline"
+
+DEADLINE = "deadline"
+DISCONNECT = "disconnect"
+# Work dropped by the workflow itself, e.g. a speculative generation after a rejection
+CANCELLED = "cancelled"
+
+
+class DeadlineExceeded(TimeoutError):
+    """The request's deadline passed before the LLM work finished"""
+
+
+class ClientDisconnected(Exception):
+    """The client closed the connection while the request was being served"""
+
+
+class RequestBudget:
+    __slots__ = ("deadline", "cancel_reason")
+
+    def __init__(self, deadline: Optional[float]):
+        # time.monotonic() value, or None for no deadline
+        self.deadline = deadline
+        self.cancel_reason: Optional[str] = None
+
+
+request_budget: ContextVar[Optional[RequestBudget]] = ContextVar(
+    "request_budget", default=None
+)
+
+
+def deadline_seconds(
+    headers: Mapping[str, str], default_seconds: float
+) -> Optional[float]:
+    """Seconds the request may take: the header or the default, whichever is shorter"""
+    seconds = [default_seconds] if default_seconds > 0 else []
+    value = headers.get(DEADLINE_HEADER)
+    if value:
+        try:
+            seconds.append(max(0.0, float(value)))
+        except ValueError:
+            pass
+    return min(seconds) if seconds else None
+
+
+def start_budget(seconds: Optional[float]) -> RequestBudget:
+    """Open the budget for the current request"""
+    budget = RequestBudget(None if seconds is None else time.monotonic() + seconds)
+    request_budget.set(budget)
+    return budget
+
+
+def remaining() -> Optional[float]:
+    """Seconds left before the current request's deadline, or None without one"""
+    budget = request_budget.get()
+    if budget is None or budget.deadline is None:
+        return None
+    return budget.deadline - time.monotonic()
+
+
+def cancel_reason() -> str:
+    """Why the current request's work is being cancelled"""
+    budget = request_budget.get()
+    return (budget.cancel_reason if budget else None) or CANCELLED
+
+
+def expire(message: str) -> DeadlineExceeded:
+    budget = request_budget.get()
+    if budget is not None and budget.cancel_reason is None:
+        budget.cancel_reason = DEADLINE
+    return DeadlineExceeded(message)
+
+
+def check_deadline(what: str) -> None:
+    left = remaining()
+    if left is not None and left <= 0:
+        raise expire(f"Request deadline passed before {what}")
+
+
+async def within_deadline(awaitable: Awaitable[Any], what: str) -> Any:
+    """Await awaitable, cancelling it and raising DeadlineExceeded at the deadline"""
+    left = remaining()
+    if left is None:
+        return await awaitable
+    if left <= 0:
+        if asyncio.iscoroutine(awaitable):
+            awaitable.close()
+        raise expire(f"Request deadline passed before {what}")
+    try:
+        return await asyncio.wait_for(awaitable, left)
+    except asyncio.TimeoutError:
+        raise expire(f"Request deadline passed during {what}") from None
+
+
+async def wait_for_disconnect(receive: Callable[[], Awaitable[Dict[str, Any]]]):
+    """Return once the ASGI server reports http.disconnect; the body is already read"""
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            return
+
+
+async def run_until_disconnect(receive, awaitable: Awaitable[Any]) -> Any:
+    """
+    Await awaitable in its own task and cancel it if the client disconnects first;
+    raises ClientDisconnected in that case
+    """
+    task = asyncio.ensure_future(awaitable)
+    watcher = asyncio.ensure_future(wait_for_disconnect(receive))
+    try:
+        await asyncio.wait({task, watcher}, return_when=asyncio.FIRST_COMPLETED)
+        if task.done():
+            return task.result()
+        budget = request_budget.get()
+        if budget is not None:
+            budget.cancel_reason = DISCONNECT
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        raise ClientDisconnected()
+    finally:
+        watcher.cancel()
+        task.cancel()
+
+
+async def stream_until_disconnect(receive, iterator: AsyncIterator[Any]):
+    """
+    Yield the items of iterator, which runs in its own task so that a disconnect
+    (reported by the server or seen when sending fails) cancels the work in progress
+    """
+    queue: asyncio.Queue = asyncio.Queue()
+    done = object()
+
+    async def produce():
+        try:
+            async for item in iterator:
+                queue.put_nowait((item, None))
+            queue.put_nowait((done, None))
+        except Exception as e:
+            queue.put_nowait((done, e))
+
+    async def watch():
+        await wait_for_disconnect(receive)
+        budget = request_budget.get()
+        if budget is not None:
+            budget.cancel_reason = DISCONNECT
+        producer.cancel()
+        queue.put_nowait((done, None))
+
+    producer = asyncio.create_task(produce())
+    watcher = asyncio.create_task(watch())
+    try:
+        while True:
+            item, error = await queue.get()
+            if item is done:
+                if error is not None:
+                    raise error
+                return
+            yield item
+    finally:
+        watcher.cancel()
+        if not producer.done():
+            budget = request_budget.get()
+            if budget is not None and budget.cancel_reason is None:
+                # The response generator was closed: sending to the client failed
+                budget.cancel_reason = DISCONNECT
+            producer.cancel()
@@ -0,0 +1,158 @@
+"""
+Copy-on-write, versioned site documents.
+
+A site's generated content (the model_output list of {"pages": [page]} entries) is
+treated as immutable. An edit never writes into an existing entry or page: it builds a
+new page dict holding the changed fields and references every other field, entry and
+page from the previous version. A new version therefore costs O(changed fields) plus one
+list of entry references, and older versions stay valid for concurrent readers,
+snapshots and undo.
+
+The pages are plain dicts so they can go straight into prompts, json.dumps and the API
+responses. Immutability is a convention: code holding a page from a document must copy
+it before changing it, as merge_page does.
+"""
+
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+# Page indexes are cached by the identity of the model_output list or payload dict they
+# describe. Documents are copy-on-write, so an unchanged object is an unchanged site
+# version. Each entry keeps a reference to its object so the id cannot be reused while
+# the entry is cached.
+INDEX_CACHE_SIZE = 128
+site_indexes: "OrderedDict[Tuple[str, int], Tuple[Any, Any]]" = OrderedDict()
+
+
+def merge_page(page: Dict[str, Any], updates: Dict[str, Any]) -> Dict[str, Any]:
+    """New page with the non-None values of updates applied; page itself is not touched"""
+    merged = dict(page)
+    for key, value in updates.items():
+        if value is not None:
+            merged[key] = value
+    return merged
+
+
+def remember_index(kind: str, source: Any, index: Any) -> None:
+    site_indexes[(kind, id(source))] = (source, index)
+    site_indexes.move_to_end((kind, id(source)))
+    while len(site_indexes) > INDEX_CACHE_SIZE:
+        site_indexes.popitem(last=False)
+
+
+def cached_index(kind: str, source: Any, build: Callable[[Any], Any]) -> Any:
+    entry = site_indexes.get((kind, id(source)))
+    if entry is not None and entry[0] is source:
+        site_indexes.move_to_end((kind, id(source)))
+        return entry[1]
+    index = build(source)
+    remember_index(kind, source, index)
+    return index
+
+
+def build_page_positions(model_output: Sequence[Dict[str, Any]]) -> Dict[str, int]:
+    positions: Dict[str, int] = {}
+    for index, entry in enumerate(model_output):
+        pages = entry.get("pages") or [{}]
+        positions.setdefault(pages[0].get("Page Name", "").lower(), index)
+    return positions
+
+
+def page_positions(model_output: Sequence[Dict[str, Any]]) -> Dict[str, int]:
+    """Lowercased page name -> entry index (first wins) for this model_output version"""
+    return cached_index("positions", model_output, build_page_positions)
+
+
+def find_page_index(model_output: Sequence[Dict[str, Any]], page_name: str) -> int:
+    """Index of the entry holding page_name (case-insensitive), or -1"""
+    return page_positions(model_output).get(page_name.lower(), -1)
+
+
+class PayloadIndex:
+    """Left-panel entries by lowercased title, and the business-info projection"""
+
+    __slots__ = ("left_panels", "business_info")
+
+    def __init__(self, payload_data: Dict[str, Any]):
+        self.left_panels: Dict[str, Dict[str, Any]] = {}
+        for entry in payload_data.get("pages", []):
+            self.left_panels.setdefault(entry.get("title", "").lower(), entry)
+        self.business_info = {
+            k: v for k, v in payload_data.items() if k.lower() != "pages"
+        }
+
+
+def payload_index(payload_data: Dict[str, Any]) -> PayloadIndex:
+    return cached_index("payload", payload_data, PayloadIndex)
+
+
+class PageLocation(NamedTuple):
+    position: int  # index of the page's entry in model_output
+    main_output: List[Dict[str, Any]]  # the entry's "pages" list
+    left_panel: Dict[str, Any]
+    business_info: Dict[str, Any]  # shared between requests, do not mutate
+
+
+def replace_page(
+    model_output: Sequence[Dict[str, Any]], index: int, page: Dict[str, Any]
+) -> List[Dict[str, Any]]:
+    """New model_output list with the first page of entry index replaced; the rest is shared"""
+    entry = model_output[index]
+    new_entry = dict(entry)
+    new_entry["pages"] = [page] + list(entry.get("pages", [])[1:])
+    new_output = list(model_output)
+    new_output[index] = new_entry
+    return new_output
+
+
+class SiteDocument:
+    """One immutable version of a site's generated pages"""
+
+    __slots__ = ("entries", "version", "output")
+
+    def __init__(self, entries: Sequence[Dict[str, Any]], version: int = 1):
+        self.entries = tuple(entries)
+        self.version = version
+        self.output: Optional[List[Dict[str, Any]]] = None
+
+    @classmethod
+    def from_model_output(
+        cls, model_output: Sequence[Dict[str, Any]]
+    ) -> "SiteDocument":
+        # No copy: the source is never written to once it is wrapped
+        return cls(model_output)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def page(self, index: int) -> Dict[str, Any]:
+        return self.entries[index]["pages"][0]
+
+    def index_of(self, page_name: str) -> int:
+        return find_page_index(self.entries, page_name)
+
+    def to_model_output(self) -> List[Dict[str, Any]]:
+        """
+        model_output list for the existing pipeline. Built once per version, so page
+        indexes cached for it stay valid; entries are shared, not copied.
+        """
+        if self.output is None:
+            self.output = list(self.entries)
+        return self.output
+
+    def with_page(self, index: int, page: Dict[str, Any]) -> "SiteDocument":
+        return SiteDocument(replace_page(self.entries, index, page), self.version + 1)
+
+    def with_updates(self, index: int, updates: Dict[str, Any]) -> "SiteDocument":
+        return self.with_page(index, merge_page(self.page(index), updates))
+
+    def with_model_output(
+        self, model_output: Sequence[Dict[str, Any]]
+    ) -> Optional["SiteDocument"]:
+        """Next version from an updated model_output, or None when nothing changed"""
+        entries = tuple(model_output)
+        if len(entries) == len(self.entries) and all(
+            new is old for new, old in zip(entries, self.entries)
+        ):
+            return None
+        return SiteDocument(entries, self.version + 1)
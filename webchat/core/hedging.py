@@ -0,0 +1,136 @@
+"""
+Hedged LLM calls for tail latency.
+
+For chains listed in WEBCHAT_HEDGED_CHAINS, ainvoke_chain runs each attempt through
+hedged(). If the call has not finished by the chain's observed WEBCHAT_HEDGE_QUANTILE
+latency, an identical second call is started. Whichever call succeeds first is used and
+the other is cancelled. A failure only counts once both calls have failed.
+
+Extra spend is bounded per chain by a credit budget. Every call adds
+WEBCHAT_HEDGE_BUDGET credit, capped at MAX_HEDGE_CREDIT, and every hedge spends one
+credit, so in the long run at most that fraction of calls is hedged. Hedging waits for
+WEBCHAT_HEDGE_MIN_SAMPLES latencies before it starts.
+
+Both calls go through the admission controller like any other call. Only the winner's
+token usage is recorded; webchat_llm_hedges_total shows the extra calls.
+"""
+
+import asyncio
+import math
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from webchat.core.metrics import Counter, Gauge
+from webchat.settings import (
+    HEDGED_CHAINS,
+    HEDGE_QUANTILE,
+    HEDGE_BUDGET,
+    HEDGE_WINDOW,
+    HEDGE_MIN_SAMPLES,
+)
+
+# Hedges a chain may fire back to back after a quiet period
+MAX_HEDGE_CREDIT = 5.0
+
+hedges_fired = Counter(
+    "webchat_llm_hedges_total", "Second calls started for slow chain calls", ("chain",)
+)
+hedge_wins = Counter(
+    "webchat_llm_hedge_wins_total",
+    "Hedged chain calls by the call that returned first",
+    ("chain", "winner"),
+)
+hedges_skipped = Counter(
+    "webchat_llm_hedges_skipped_total",
+    "Slow chain calls not hedged because the chain's hedging budget was spent",
+    ("chain",),
+)
+hedge_delay = Gauge(
+    "webchat_llm_hedge_delay_seconds",
+    "Latency after which a chain call is hedged",
+    ("chain",),
+)
+
+
+class HedgePolicy:
+    def __init__(self, chain: str):
+        self.chain = chain
+        self.latencies: deque = deque(maxlen=HEDGE_WINDOW)
+        self.credit = 0.0
+
+    def observe(self, seconds: float) -> None:
+        self.latencies.append(seconds)
+
+    def delay(self) -> Optional[float]:
+        """Seconds to wait before hedging, or None until enough latencies are known"""
+        if len(self.latencies) < max(1, HEDGE_MIN_SAMPLES):
+            return None
+        ordered = sorted(self.latencies)
+        index = min(len(ordered) - 1, math.ceil(HEDGE_QUANTILE * len(ordered)) - 1)
+        seconds = ordered[max(0, index)]
+        hedge_delay.set(self.chain, value=seconds)
+        return seconds
+
+    def add_credit(self) -> None:
+        self.credit = min(MAX_HEDGE_CREDIT, self.credit + HEDGE_BUDGET)
+
+    def take_credit(self) -> bool:
+        if self.credit < 1.0:
+            return False
+        self.credit -= 1.0
+        return True
+
+
+policies: Dict[str, HedgePolicy] = {name: HedgePolicy(name) for name in HEDGED_CHAINS}
+
+
+async def race(chain: str, primary: asyncio.Task, hedge: asyncio.Task) -> Any:
+    """Result of the first call to succeed; the error of the primary if both fail"""
+    pending = {primary, hedge}
+    while pending:
+        done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        for task in (primary, hedge):
+            if task in done and not task.cancelled() and task.exception() is None:
+                hedge_wins.inc(chain, "primary" if task is primary else "hedge")
+                return task.result()
+    return primary.result()
+
+
+async def hedged(chain: str, call: Callable[[], Awaitable[Any]]) -> Any:
+    """Await call(), starting a second call() if chain is hedged and the first is slow"""
+    policy = policies.get(chain)
+    if policy is None:
+        return await call()
+
+    policy.add_credit()
+    delay = policy.delay()
+    started = time.monotonic()
+    primary = asyncio.ensure_future(call())
+    hedge = None
+    try:
+        if delay is not None:
+            await asyncio.wait({primary}, timeout=delay)
+        if primary.done() or delay is None:
+            result = await primary
+            policy.observe(time.monotonic() - started)
+            return result
+
+        if not policy.take_credit():
+            hedges_skipped.inc(chain)
+            result = await primary
+            policy.observe(time.monotonic() - started)
+            return result
+
+        hedges_fired.inc(chain)
+        hedge = asyncio.ensure_future(call())
+        result = await race(chain, primary, hedge)
+        # The primary's own latency is at least this; it is unknown if the hedge won
+        policy.observe(time.monotonic() - started)
+        return result
+    finally:
+        for task in (primary, hedge):
+            if task is not None and not task.done():
+                task.cancel()
+                # Collect the outcome so the cancelled call does not log "never retrieved"
+                task.add_done_callback(lambda t: t.cancelled() or t.exception())
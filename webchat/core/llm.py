@@ -0,0 +1,82 @@
+"""
+Shared LLM client used by every chain in webchat.core.chains.
+
+All chains go through one ChatOpenAI instance backed by one pooled httpx client, so
+concurrent validator and generation calls reuse warm keep-alive connections instead of
+each module paying for its own pool and TLS handshakes.
+"""
+
+import importlib.util
+import logging
+import os
+from functools import lru_cache
+
+import httpx
+from langchain_openai import ChatOpenAI
+
+from webchat.settings import (
+    LLM_MODE,
+    LLM_MODEL,
+    LLM_TIMEOUT,
+    LLM_CONNECT_TIMEOUT,
+    LLM_MAX_CONNECTIONS,
+    LLM_MAX_KEEPALIVE_CONNECTIONS,
+    LLM_KEEPALIVE_EXPIRY,
+    LLM_HTTP2,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def http2_available() -> bool:
+    return importlib.util.find_spec("h2") is not None
+
+
+@lru_cache(maxsize=None)
+def get_http_async_client() -> httpx.AsyncClient:
+    """Return the process-wide pooled async HTTP client for LLM calls"""
+    http2 = LLM_HTTP2 and http2_available()
+    if LLM_HTTP2 and not http2:
+        logger.info("h2 is not installed, LLM client falls back to HTTP/1.1")
+    return httpx.AsyncClient(
+        http2=http2,
+        limits=httpx.Limits(
+            max_connections=LLM_MAX_CONNECTIONS,
+            max_keepalive_connections=LLM_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=LLM_KEEPALIVE_EXPIRY,
+        ),
+        timeout=httpx.Timeout(LLM_TIMEOUT, connect=LLM_CONNECT_TIMEOUT),
+        follow_redirects=True,
+    )
+
+
+@lru_cache(maxsize=None)
+def get_llm() -> ChatOpenAI:
+    """Return the shared ChatOpenAI instance"""
+    # Retries are done by the chain registry through the admission controller, so they
+    # are queued and rate limited like any other call instead of stacking up inside
+    # the OpenAI client
+    options = {}
+    if LLM_MODE in ("replay", "fake") and not os.getenv("OPENAI_API_KEY"):
+        # Offline backends never reach the client, but it still needs a key to build
+        options["api_key"] = "offline"
+    return ChatOpenAI(
+        model=LLM_MODEL,
+        temperature=0,
+        use_responses_api=True,
+        max_retries=0,
+        http_async_client=get_http_async_client(),
+        **options,
+    )
+
+
+async def close_llm_clients() -> None:
+    """
+    Close the pooled HTTP client on application shutdown. The cached client and the
+    ChatOpenAI built on it are dropped too, so a later startup in the same process gets
+    a new pool instead of the closed one.
+    """
+    if get_http_async_client.cache_info().currsize:
+        await get_http_async_client().aclose()
+    get_llm.cache_clear()
+    get_http_async_client.cache_clear()
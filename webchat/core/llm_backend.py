@@ -0,0 +1,294 @@
+"""
+Pluggable LLM backend for the chain registry: live, record, replay or fake.
+
+WEBCHAT_LLM_MODE picks what a chain call does:
+
+- live: call the model (the default)
+- record: call the model and save the parsed output, the reported usage and the
+  latency under WEBCHAT_LLM_CASSETTE_DIR, keyed by a hash of the rendered prompt
+- replay: serve the saved output for the rendered prompt after a synthetic delay. A
+  prompt that was never recorded raises CassetteMissError, or gets a fake output with
+  WEBCHAT_LLM_REPLAY_FAKE_MISSING
+- fake: synthesize a schema-valid output from the chain's schema. Validators pass
+  unless the query matches WEBCHAT_LLM_FAKE_REJECT_PATTERN
+
+Keys depend only on the rendered messages, so a recording made through an invoked chain
+also serves the streamed chain with the same prompt. Replayed and fake calls still go
+through the admission controller, so queueing behaves as it does against the provider.
+"""
+
+import asyncio
+import hashlib
+import json
+import math
+import os
+import random
+import re
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+from langchain_core.messages import AIMessage
+from pydantic import BaseModel
+
+from webchat.core.token_usage import reported_usage
+from webchat.settings import (
+    LLM_MODE,
+    LLM_CASSETTE_DIR,
+    LLM_SYNTHETIC_LATENCY,
+    LLM_SYNTHETIC_SEED,
+    LLM_REPLAY_FAKE_MISSING,
+    LLM_FAKE_REJECT_PATTERN,
+)
+
+MODES = ("live", "record", "replay", "fake")
+if LLM_MODE not in MODES:
+    raise ValueError(
+        f"WEBCHAT_LLM_MODE must be one of {', '.join(MODES)}, not {LLM_MODE}"
+    )
+
+# Items in a fake array output, e.g. the three suggested outputs
+FAKE_ARRAY_ITEMS = 3
+
+# Recordings already read from disk, by prompt key
+recordings: Dict[str, Dict[str, Any]] = {}
+rng = random.Random(LLM_SYNTHETIC_SEED)
+
+
+class CassetteMissError(LookupError):
+    """Replay mode was asked for a prompt that has no recording"""
+
+
+def prompt_key(prompt, input_data: Dict[str, Any]) -> str:
+    """Hash of the messages prompt renders for input_data"""
+    digest = hashlib.sha256()
+    for message in prompt.format_messages(**input_data):
+        digest.update(message.type.encode())
+        digest.update(b"\x00")
+        digest.update(str(message.content).encode())
+        digest.update(b"\x00")
+    return digest.hexdigest()
+
+
+def cassette_path(key: str) -> str:
+    return os.path.join(LLM_CASSETTE_DIR, key[:2], f"{key}.json")
+
+
+def read_recording(key: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(cassette_path(key), encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def write_recording(key: str, entry: Dict[str, Any]) -> None:
+    path = cassette_path(key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Write then rename so a concurrent replay never reads half a file
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(entry, f, indent=2, ensure_ascii=False)
+    os.replace(temp_path, path)
+
+
+async def save_recording(key, name, output, raw, latency) -> None:
+    usage = reported_usage(raw)
+    entry = {
+        "chain": name,
+        "output": (
+            output.model_dump(mode="json") if isinstance(output, BaseModel) else output
+        ),
+        "usage": (
+            dict(zip(("input_tokens", "output_tokens", "cache_read"), usage))
+            if usage
+            else None
+        ),
+        "latency": latency,
+    }
+    recordings[key] = entry
+    await asyncio.to_thread(write_recording, key, entry)
+
+
+def latency_sampler(spec: str) -> Callable[[Optional[float]], float]:
+    """Delay function for a WEBCHAT_LLM_SYNTHETIC_LATENCY value, given the recorded latency"""
+    kind, _, args = spec.strip().lower().partition(":")
+    params = [float(arg) for arg in args.split(":")] if args else []
+    if kind == "recorded":
+        return lambda recorded: recorded or 0.0
+    if kind == "uniform":
+        return lambda recorded: rng.uniform(params[0], params[1])
+    if kind == "normal":
+        return lambda recorded: max(0.0, rng.gauss(params[0], params[1]))
+    if kind == "lognormal":
+        return lambda recorded: rng.lognormvariate(math.log(params[0]), params[1])
+    seconds = float(kind)
+    return lambda recorded: seconds
+
+
+sample_latency = latency_sampler(
+    LLM_SYNTHETIC_LATENCY or ("recorded" if LLM_MODE == "replay" else "0")
+)
+
+
+def is_model(schema) -> bool:
+    return isinstance(schema, type) and issubclass(schema, BaseModel)
+
+
+def fake_value(spec, root, name: str, input_data: Dict[str, Any], index: int = 0):
+    """Value valid for JSON schema spec; scores pass and reasons are empty"""
+    if "$ref" in spec:
+        spec = root["$defs"][spec["$ref"].rsplit("/", 1)[-1]]
+    if "anyOf" in spec:
+        options = [o for o in spec["anyOf"] if o.get("type") != "null"]
+        spec = options[0] if options else {"type": "null"}
+
+    kind = spec.get("type")
+    if kind == "object":
+        return {
+            key: fake_value(spec["properties"][key], root, key, input_data)
+            for key in spec.get("required", [])
+        }
+    if kind == "array":
+        items = spec.get("items", {})
+        return [
+            fake_value(items, root, name, input_data, i)
+            for i in range(FAKE_ARRAY_ITEMS)
+        ]
+    if kind in ("integer", "number"):
+        return 1 if name.endswith("score") else 0
+    if kind == "boolean":
+        return True
+    if kind == "string":
+        if name.endswith("reason"):
+            return ""
+        if isinstance(input_data.get(name), str):
+            return input_data[name]
+        base = input_data.get("text_to_change") or name
+        return f"{base} (suggestion {index + 1})"
+    return None
+
+
+def synthesize(name: str, schema, input_data: Dict[str, Any]) -> Dict[str, Any]:
+    spec = schema.model_json_schema() if is_model(schema) else schema
+    output = fake_value(spec, spec, "", input_data)
+
+    query = input_data.get("query") or input_data.get("search_query_or_request") or ""
+    if LLM_FAKE_REJECT_PATTERN and re.search(LLM_FAKE_REJECT_PATTERN, str(query), re.I):
+        for key in spec.get("properties", {}):
+            if key.endswith("score"):
+                output[key] = 0
+            elif key.endswith("reason"):
+                output[key] = "The query matches WEBCHAT_LLM_FAKE_REJECT_PATTERN"
+    return {"chain": name, "output": output, "usage": None, "latency": None}
+
+
+async def offline_entry(name, prompt, schema, input_data) -> Dict[str, Any]:
+    """Recorded entry for replay, synthesized entry for fake mode"""
+    if LLM_MODE == "fake":
+        # Fake outputs do not depend on the rendered prompt, so it is never rendered
+        return synthesize(name, schema, input_data)
+    key = prompt_key(prompt, input_data)
+    entry = recordings.get(key)
+    if entry is None:
+        entry = await asyncio.to_thread(read_recording, key)
+        if entry is None:
+            if not LLM_REPLAY_FAKE_MISSING:
+                raise CassetteMissError(
+                    f"No recording of chain {name} for prompt {key} in {LLM_CASSETTE_DIR}"
+                )
+            entry = synthesize(name, schema, input_data)
+        recordings[key] = entry
+    return entry
+
+
+def entry_message(entry: Dict[str, Any]) -> Optional[AIMessage]:
+    """AIMessage carrying the recorded usage, so replayed calls are counted like live ones"""
+    usage = entry.get("usage")
+    if not usage:
+        return None
+    return AIMessage(
+        content="",
+        usage_metadata={
+            "input_tokens": usage["input_tokens"],
+            "output_tokens": usage["output_tokens"],
+            "total_tokens": usage["input_tokens"] + usage["output_tokens"],
+            "input_token_details": {"cache_read": usage.get("cache_read", 0)},
+        },
+    )
+
+
+def partial_outputs(output: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Outputs a streaming parser would yield: the first list field growing item by item"""
+    lists = [key for key, value in output.items() if isinstance(value, list)]
+    if not lists:
+        return [output]
+    items = output[lists[0]]
+    return [{**output, lists[0]: items[:i]} for i in range(1, len(items))] + [output]
+
+
+async def invoke(
+    name: str,
+    prompt,
+    schema,
+    input_data: Dict[str, Any],
+    live: Callable[[], Awaitable[Dict[str, Any]]],
+) -> Dict[str, Any]:
+    """
+    One chain call in include_raw form ({"raw", "parsed", "parsing_error"}); live makes
+    the real call
+    """
+    if LLM_MODE == "live":
+        return await live()
+    if LLM_MODE == "record":
+        key = prompt_key(prompt, input_data)
+        started = time.monotonic()
+        output = await live()
+        if output.get("parsing_error") is None and output.get("parsed") is not None:
+            await save_recording(
+                key,
+                name,
+                output["parsed"],
+                output.get("raw"),
+                time.monotonic() - started,
+            )
+        return output
+
+    entry = await offline_entry(name, prompt, schema, input_data)
+    await asyncio.sleep(sample_latency(entry.get("latency")))
+    parsed = entry["output"]
+    if is_model(schema):
+        parsed = schema.model_validate(parsed)
+    return {"raw": entry_message(entry), "parsed": parsed, "parsing_error": None}
+
+
+async def stream(
+    name: str,
+    prompt,
+    schema,
+    input_data: Dict[str, Any],
+    live: Callable[[], AsyncIterator[Any]],
+) -> AsyncIterator[Any]:
+    """Streamed chain call; replayed and fake outputs arrive in chunks over the latency"""
+    if LLM_MODE == "live":
+        async for chunk in live():
+            yield chunk
+        return
+    if LLM_MODE == "record":
+        key = prompt_key(prompt, input_data)
+        started = time.monotonic()
+        last_chunk = None
+        async for chunk in live():
+            last_chunk = chunk
+            yield chunk
+        if isinstance(last_chunk, dict):
+            await save_recording(
+                key, name, last_chunk, None, time.monotonic() - started
+            )
+        return
+
+    entry = await offline_entry(name, prompt, schema, input_data)
+    chunks = partial_outputs(entry["output"])
+    delay = sample_latency(entry.get("latency")) / len(chunks)
+    for chunk in chunks:
+        await asyncio.sleep(delay)
+        yield chunk
@@ -0,0 +1,271 @@
+"""
+Timing spans, histograms and in-flight gauges, exposed in the Prometheus text format.
+
+A span times one unit of work: an HTTP request, a workflow stage or an LLM chain call.
+When it closes it observes its duration in a histogram labelled with the name, the
+section kind and action type of the request (taken from the token usage labels the API
+layer sets) and the outcome:
+
+- pass: the work finished normally
+- rejected: a guardrail turned the query down (set by the code inside the span)
+- error: an exception escaped the span
+- cancelled: the work was cancelled, e.g. a speculative generation after a rejection
+
+While open, a span counts in the in-flight gauge of its kind. GET /metrics renders every
+metric; collectors registered with add_collector refresh gauges owned by other
+components (the admission controller) just before rendering.
+"""
+
+import asyncio
+import functools
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Tuple
+
+from webchat.core.token_usage import usage_labels
+
+PASS = "pass"
+REJECTED = "rejected"
+ERROR = "error"
+CANCELLED = "cancelled"
+
+# Upper bounds in seconds; LLM calls dominate, so the buckets reach well past a minute
+DURATION_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    20.0,
+    40.0,
+    80.0,
+)
+
+registry: List["Metric"] = []
+collectors: List[Callable[[], None]] = []
+
+
+def escape_label(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def format_labels(names: Tuple[str, ...], values: Tuple[Any, ...]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{n}="{escape_label(v)}"' for n, v in zip(names, values))
+    return f"{{{pairs}}}"
+
+
+def format_number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, label_names=()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        registry.append(self)
+
+    def header(self) -> List[str]:
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name, documentation, label_names=()):
+        super().__init__(name, documentation, label_names)
+        self.values: Dict[Tuple, float] = {}
+
+    def inc(self, *labels, amount: float = 1) -> None:
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def render(self) -> List[str]:
+        return self.header() + [
+            f"{self.name}{format_labels(self.label_names, labels)} {format_number(value)}"
+            for labels, value in sorted(self.values.items())
+        ]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, *labels, amount: float = 1) -> None:
+        self.inc(*labels, amount=-amount)
+
+    def set(self, *labels, value: float) -> None:
+        self.values[labels] = value
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, label_names=(), buckets=DURATION_BUCKETS):
+        super().__init__(name, documentation, label_names)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        # labels -> [per-bucket counts, sum]; counts are cumulated when rendering
+        self.series: Dict[Tuple, List[Any]] = {}
+
+    def observe(self, value: float, *labels) -> None:
+        series = self.series.get(labels)
+        if series is None:
+            series = self.series[labels] = [[0] * len(self.buckets), 0.0]
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                series[0][index] += 1
+                break
+        series[1] += value
+
+    def render(self) -> List[str]:
+        lines = self.header()
+        label_names = self.label_names + ("le",)
+        for labels, (counts, total) in sorted(self.series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                bucket_labels = format_labels(
+                    label_names, labels + (format_number(bound),)
+                )
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            series_labels = format_labels(self.label_names, labels)
+            lines.append(f"{self.name}_sum{series_labels} {format_number(total)}")
+            lines.append(f"{self.name}_count{series_labels} {cumulative}")
+        return lines
+
+
+def add_collector(collector: Callable[[], None]) -> None:
+    """Call collector before every rendering, e.g. to copy another component's stats"""
+    collectors.append(collector)
+
+
+def render_metrics() -> str:
+    """Every registered metric in the Prometheus text exposition format"""
+    for collector in collectors:
+        collector()
+    lines = []
+    for metric in registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+SPAN_LABELS = ("section", "action_type", "outcome")
+
+request_seconds = Histogram(
+    "webchat_request_duration_seconds",
+    "Duration of API requests",
+    ("endpoint",) + SPAN_LABELS,
+)
+requests_in_flight = Gauge(
+    "webchat_requests_in_flight", "API requests being served", ("endpoint",)
+)
+stage_seconds = Histogram(
+    "webchat_stage_duration_seconds",
+    "Duration of workflow stages",
+    ("stage",) + SPAN_LABELS,
+)
+stages_in_flight = Gauge(
+    "webchat_stages_in_flight", "Workflow stages running", ("stage",)
+)
+chain_seconds = Histogram(
+    "webchat_llm_chain_duration_seconds",
+    "Duration of LLM chain calls, including admission queueing and retries",
+    ("chain",) + SPAN_LABELS,
+)
+chains_in_flight = Gauge(
+    "webchat_llm_chains_in_flight", "LLM chain calls in progress", ("chain",)
+)
+tokens_saved = Counter(
+    "webchat_llm_tokens_saved_total",
+    "Estimated tokens not spent because a chain call was cancelled or hit the deadline",
+    ("chain", "reason"),
+)
+calls_cancelled = Counter(
+    "webchat_llm_calls_cancelled_total",
+    "Chain calls cancelled, by whether they were still queued or already sent",
+    ("chain", "reason", "state"),
+)
+
+
+class Span:
+    __slots__ = ("outcome",)
+
+    def __init__(self):
+        self.outcome = PASS
+
+
+@contextmanager
+def span(histogram: Histogram, in_flight: Gauge, name: str) -> Iterator[Span]:
+    """
+    Time the enclosed block. Labels are read when the block exits, so a request that
+    sets its usage labels inside the span is still labelled.
+    """
+    current = Span()
+    in_flight.inc(name)
+    started = time.perf_counter()
+    try:
+        yield current
+    except (asyncio.CancelledError, GeneratorExit):
+        current.outcome = CANCELLED
+        raise
+    except BaseException:
+        current.outcome = ERROR
+        raise
+    finally:
+        in_flight.dec(name)
+        section, action_type = usage_labels.get()
+        histogram.observe(
+            time.perf_counter() - started, name, section, action_type, current.outcome
+        )
+
+
+def request_span(endpoint: str):
+    return span(request_seconds, requests_in_flight, endpoint)
+
+
+def stage_span(stage: str):
+    return span(stage_seconds, stages_in_flight, stage)
+
+
+def chain_span(chain: str):
+    return span(chain_seconds, chains_in_flight, chain)
+
+
+def response_outcome(response: Any) -> str:
+    """Outcome of an API response dict: failed, guardrail-rejected or passed"""
+    if not isinstance(response, dict) or not response.get("success"):
+        return ERROR
+    if response.get("response_type") == "error":
+        return REJECTED
+    return PASS
+
+
+def timed_request(endpoint: str):
+    """Decorator timing an async handler that returns an API response dict"""
+
+    def decorator(handler):
+        @functools.wraps(handler)
+        async def wrapper(*args, **kwargs):
+            with request_span(endpoint) as current:
+                response = await handler(*args, **kwargs)
+                current.outcome = response_outcome(response)
+                return response
+
+        return wrapper
+
+    return decorator
+
+
@@ -0,0 +1,206 @@
+"""
+Section/field schema for generated pages.
+
+One table describes every page field: its key in the generated page, its key in API
+responses and the section name identify_content_section reports for it. Lookup tables
+for every alias, case variant and API-key form are built once at import, so resolving a
+section or field name on the update path is a dict lookup instead of a scan over the
+page keys. The old fuzzy matching (substring/prefix over the actual keys) is kept as a
+cached fallback for names the schema does not know.
+
+Paths address a value inside a page: (key,) for a top-level field,
+("h2_sections", index, key) for a field of one H2 section and
+("Image Recommendations", index) for one image recommendation.
+"""
+
+import re
+from functools import lru_cache
+from typing import Any, Dict, NamedTuple, Optional, Tuple
+
+FieldPath = Tuple[Any, ...]
+
+
+class FieldSpec(NamedTuple):
+    key: str  # key in the generated page
+    api_key: str  # key in API responses
+    section: str  # section name reported by identify_content_section
+    aliases: Tuple[str, ...] = ()
+
+
+PAGE_FIELDS = (
+    FieldSpec("Page Name", "Page_Name", "Page Name"),
+    FieldSpec("Meta Title (30 to 60 Characters)", "Meta_Title", "Meta Title"),
+    FieldSpec(
+        "Meta Description (70 to 143 Characters)",
+        "Meta_Description",
+        "Meta Description",
+    ),
+    FieldSpec("Hero Title (20 to 70 Characters)", "Hero_Title", "Hero Title"),
+    FieldSpec("Hero Text (50 to 100 Characters)", "Hero_Text", "Hero Text"),
+    FieldSpec("Hero CTA", "Hero_CTA", "Hero CTA"),
+    FieldSpec("H1 (30 to 70 Characters)", "H1", "H1 Title"),
+    FieldSpec("H1 Content", "H1_Content", "H1 Content"),
+    FieldSpec("h2_sections", "h2_sections", "H2 Sections"),
+    FieldSpec("Header", "Header", "Header"),
+    FieldSpec("Leading Sentence", "Leading_Sentence", "Leading Sentence"),
+    FieldSpec("CTA Button", "CTA_Button", "CTA Button"),
+    FieldSpec(
+        "Image Recommendations",
+        "Image_Recommendations",
+        "Image Recommendation",
+    ),
+)
+
+H2_FIELDS = (
+    FieldSpec("H2 Heading", "H2_Heading", "H2 Heading"),
+    FieldSpec("H2 Content", "H2_Content", "H2 Content"),
+)
+
+
+def build_alias_table(specs) -> Dict[str, FieldSpec]:
+    """Every spelling of every field, case-folded, mapped to its spec"""
+    table: Dict[str, FieldSpec] = {}
+    for spec in specs:
+        names = (
+            spec.key,
+            spec.api_key,
+            spec.section,
+            # "Meta Title (30 to 60 Characters)" -> "Meta Title"
+            re.sub(r"\s*\(.*\)$", "", spec.key),
+        ) + spec.aliases
+        for name in names:
+            for variant in (name, name.replace("_", " "), name.replace(" ", "_")):
+                table.setdefault(variant.casefold(), spec)
+    return table
+
+
+PAGE_ALIASES = build_alias_table(PAGE_FIELDS)
+H2_ALIASES = build_alias_table(H2_FIELDS)
+FIELD_ALIASES = {**H2_ALIASES, **PAGE_ALIASES}
+
+# Page key -> API response key
+API_KEYS = {spec.key: spec.api_key for spec in PAGE_FIELDS}
+
+# identify_content_section name -> page key
+SECTION_KEYS = {spec.section: spec.key for spec in PAGE_FIELDS + H2_FIELDS}
+
+H2_PATH_RE = re.compile(r"^h2_sections\[(\d+)\]\.?(.*)$", re.IGNORECASE)
+# "H2 Heading (Section 2)" as reported by identify_content_section
+H2_SECTION_RE = re.compile(r"^H2 (Heading|Content) \(Section (\d+)\)$")
+# Older identifiers such as "H2 Section 1 Heading"
+H2_LOOSE_RE = re.compile(r"H2.*?(\d+).*?(Heading|Content)")
+IMAGE_RE = re.compile(r"^Image Recommendations? (\d+)$", re.IGNORECASE)
+
+
+@lru_cache(maxsize=256)
+def fuzzy_resolver(keys: Tuple[str, ...]):
+    """
+    Fallback resolver for one key layout: exact, case-insensitive, then the first key
+    that contains or starts with the name. Built once per layout, cached per name.
+    """
+    lowered = [(key.lower(), key) for key in keys]
+
+    @lru_cache(maxsize=256)
+    def resolve(name: str) -> Optional[str]:
+        name_lower = name.lower()
+        for key_lower, key in lowered:
+            if key_lower == name_lower:
+                return key
+        for key_lower, key in lowered:
+            if name_lower in key_lower or key_lower.startswith(name_lower):
+                return key
+        return None
+
+    return resolve
+
+
+def resolve_field(fields: Dict[str, Any], name: str) -> Optional[str]:
+    """Actual key in fields for a field name, alias or API key, or None"""
+    if not name:
+        return None
+    if name in fields:
+        return name
+    spec = FIELD_ALIASES.get(name.casefold())
+    if spec is not None:
+        if spec.key in fields:
+            return spec.key
+        if spec.api_key in fields:
+            return spec.api_key
+    return fuzzy_resolver(tuple(fields))(name)
+
+
+def section_kind(section: str) -> str:
+    """
+    Strip per-instance suffixes from identify_content_section output, e.g.
+    "H2 Content (Section 2)" -> "H2 Content" and "Image Recommendation 3" -> "Image Recommendation"
+    """
+    section = re.sub(r"\s*\(Section \d+\)$", "", section)
+    return re.sub(r"\s+\d+$", "", section)
+
+
+@lru_cache(maxsize=1024)
+def resolve_section(section: str) -> Optional[FieldPath]:
+    """Path for a section name from identify_content_section, a suggestion or an update"""
+    match = H2_PATH_RE.match(section)
+    if match:
+        return "h2_sections", int(match.group(1)), match.group(2)
+
+    match = H2_SECTION_RE.match(section)
+    if match:
+        return "h2_sections", int(match.group(2)) - 1, f"H2 {match.group(1)}"
+
+    match = IMAGE_RE.match(section)
+    if match:
+        return "Image Recommendations", int(match.group(1)) - 1
+
+    spec = PAGE_ALIASES.get(section.casefold())
+    if spec is not None:
+        return (spec.key,)
+
+    match = H2_LOOSE_RE.search(section)
+    if match:
+        return "h2_sections", int(match.group(1)) - 1, f"H2 {match.group(2)}"
+    return None
+
+
+def set_path(container: Any, path: FieldPath, value: Any) -> Optional[Any]:
+    """
+    Copy of container with value stored at path, copying only the containers along the
+    path. Returns None if the path does not exist in container.
+    """
+    step, rest = path[0], path[1:]
+    if isinstance(step, int):
+        if not isinstance(container, list) or not 0 <= step < len(container):
+            return None
+        new_container = list(container)
+    else:
+        if not isinstance(container, dict):
+            return None
+        step = resolve_field(container, step)
+        if step is None:
+            return None
+        new_container = dict(container)
+
+    if rest:
+        value = set_path(container[step], rest, value)
+        if value is None:
+            return None
+    new_container[step] = value
+    return new_container
+
+
+def apply_section_value(
+    page: Dict[str, Any], section: str, value: Any
+) -> Optional[Dict[str, Any]]:
+    """New page with the section's field set to value, or None if it has no such field"""
+    path = resolve_section(section)
+    if path is None:
+        if section not in page:
+            return None
+        path = (section,)
+    return set_path(page, path, value)
+
+
+def to_api_keys(page: Dict[str, Any]) -> Dict[str, Any]:
+    """Page with display keys renamed to their API keys"""
+    return {API_KEYS.get(key, key): value for key, value in page.items()}
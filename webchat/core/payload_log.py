@@ -0,0 +1,120 @@
+"""
+Debug logging of full LLM payloads: raw responses, updated pages and whole sites.
+
+log_payload costs a single level check while payload logging is off, which is the
+default. Set WEBCHAT_PAYLOAD_LOG_LEVEL=DEBUG to turn it on. A
+WEBCHAT_PAYLOAD_LOG_SAMPLE_RATE fraction of payloads is then handed to a queue as an
+unformatted record. A listener thread serializes each record and writes it to
+WEBCHAT_PAYLOAD_LOG_FILE, so the event loop never pays for json.dumps over a large
+site. The file rotates at WEBCHAT_PAYLOAD_LOG_MAX_BYTES and rotated files are
+gzip-compressed.
+
+Payloads are serialized after log_payload returns, so callers must not mutate them
+afterwards. The workflow only logs values it has finished building.
+"""
+
+import atexit
+import gzip
+import json
+import logging
+import os
+import queue
+import random
+import shutil
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Any, Optional
+
+from webchat.settings import (
+    PAYLOAD_LOG_LEVEL,
+    PAYLOAD_LOG_SAMPLE_RATE,
+    PAYLOAD_LOG_FILE,
+    PAYLOAD_LOG_MAX_BYTES,
+    PAYLOAD_LOG_BACKUP_COUNT,
+)
+
+logger = logging.getLogger("webchat.payloads")
+logger.setLevel(PAYLOAD_LOG_LEVEL)
+# Payloads only go to their own file, never to the console handlers
+logger.propagate = False
+
+listener: Optional[QueueListener] = None
+
+
+class Payload:
+    """Log message that serializes its payload only when the record is formatted"""
+
+    __slots__ = ("label", "payload")
+
+    def __init__(self, label: str, payload: Any):
+        self.label = label
+        self.payload = payload
+
+    def __str__(self) -> str:
+        if not isinstance(self.payload, (dict, list)):
+            return f"{self.label} (non-JSON): {self.payload}"
+        try:
+            body = json.dumps(self.payload, indent=4, ensure_ascii=False, default=str)
+        except Exception as e:
+            body = f"(could not serialize: {e}) {self.payload!r}"
+        return f"{self.label}:\n{body}"
+
+
+class DeferredQueueHandler(QueueHandler):
+    """Queue records unformatted; QueueHandler would format them in the calling thread"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+def gzip_rotator(source: str, dest: str) -> None:
+    with open(source, "rb") as f_in, gzip.open(dest, "wb") as f_out:
+        shutil.copyfileobj(f_in, f_out)
+    os.remove(source)
+
+
+def start_payload_logging() -> None:
+    """Attach the queue handler and start the writer thread"""
+    global listener
+    directory = os.path.dirname(PAYLOAD_LOG_FILE)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    file_handler = RotatingFileHandler(
+        PAYLOAD_LOG_FILE,
+        maxBytes=PAYLOAD_LOG_MAX_BYTES,
+        backupCount=PAYLOAD_LOG_BACKUP_COUNT,
+        encoding="utf-8",
+        delay=True,
+    )
+    file_handler.namer = lambda name: f"{name}.gz"
+    file_handler.rotator = gzip_rotator
+    file_handler.setFormatter(logging.Formatter("%(asctime)s - %(message)s"))
+
+    records = queue.SimpleQueue()
+    logger.addHandler(DeferredQueueHandler(records))
+    listener = QueueListener(records, file_handler)
+    listener.start()
+    # Flush what is still queued when the process exits
+    atexit.register(stop_payload_logging)
+
+
+def stop_payload_logging() -> None:
+    global listener
+    if listener is None:
+        return
+    listener.stop()
+    for handler in listener.handlers:
+        handler.close()
+    for handler in logger.handlers[:]:
+        logger.removeHandler(handler)
+    listener = None
+
+
+def log_payload(label: str, payload: Any) -> None:
+    """Log a full payload if payload logging is enabled and the payload is sampled"""
+    if not logger.isEnabledFor(logging.DEBUG):
+        return
+    if PAYLOAD_LOG_SAMPLE_RATE < 1.0 and random.random() >= PAYLOAD_LOG_SAMPLE_RATE:
+        return
+    if listener is None:
+        start_payload_logging()
+    logger.debug(Payload(label, payload))
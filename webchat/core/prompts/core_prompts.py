@@ -1,5 +1,8 @@
 from langchain_core.prompts import ChatPromptTemplate
 
+# System prompts are static so providers can cache them as a shared prefix; every
+# per-request value goes in the human message. Checked by scripts/check_prompt_prefixes.py
+
 
 website_updatte_content_system_prompt = """
 You are an excellent agent in updating website content based on query or request. You will be given 
@@ -19,44 +22,6 @@ Basically in either case you need to return a completely new updated string with
 So now all you need to do is highly focus on the query which the user sends and generate or update or remove or add
 the section of the website content which the user is asking considering the "business information" and the "left panel information".
 You need to just keep those info in your mind and based on that you need to generate . Highly focus on the content section of the left panel information if it is not null.
-"""
-
-
-website_update_content_user_prompt = """
-We are now updating the {page_name} page. 
-Here is your business info 
-<business_info>
-{business_info}
-</business_info>
-
-Here is your left panel info
-<left_panel_info>
-{left_panel_info}
-<left_panel_info>
-
-Here is the output of the website page which you need to see very carefully and update only the section which is mentioned.
-as it is
-<current_output>
-{current_output}
-</current_output>
-
-
-Here is the section which are going to focus
-<section>
-{section}
-</section>
-
-Here is the text that has been dragged in the UI to change
-<text_to_change>
-{text_to_change}
-</text_to_change>
-
-
-Here is the main query which you need to focus on and based on that update the specific section of the  current output
-<query>
-{query}
-</query>
-
 
 Before Generating make sure you follow all these guidelines precisely
 First check the banned words and phrases
@@ -71,8 +36,7 @@ The guidelines below are very important and strict.
 ## Overview
 This document outlines the requirements for generating SEO-optimized website content elements with specific character limits, formatting rules, and content guidelines.
 
-Here is the section you will work with 
-Section : {section}
+The section you will work with is given in <section> in the user message.
 ## Content Elements
 
 ### 1. Meta Title
@@ -238,8 +202,7 @@ Create unique headings covering:
 <very_important_for_cta>
 Finally make sure if user asks to generate a new Hero CTA or change Hero CTA the you dont change the structure of the string
 It should be the catchy string of Hero CTA followed up by brackets (). This is a must.
-Here are all the pages name
-{all_pages_names}
+Here are all the pages name: see <all_pages_names> in the user message.
 Within the brackets add the page name which user asked from this list.
 </very_important_for_cta>
 </guidelines>
@@ -259,6 +222,48 @@ Make sure whatever you will generate will go to front end so for paragraphs add
 Finally you are supposed to return 3 suggested outputs. Make sure every output is distinct from each other but they should be aligned to business information. Make sure you return a list of 3 suggested outputs for the updated section only.
 """
 
+
+website_update_content_user_prompt = """
+Here is your business info
+<business_info>
+{business_info}
+</business_info>
+
+Here are all the pages name
+<all_pages_names>
+{all_pages_names}
+</all_pages_names>
+
+We are now updating the {page_name} page.
+Here is your left panel info
+<left_panel_info>
+{left_panel_info}
+</left_panel_info>
+
+Here is the output of the website page which you need to see very carefully and update only the section which is mentioned.
+as it is
+<current_output>
+{current_output}
+</current_output>
+
+Here is the section which are going to focus
+<section>
+{section}
+</section>
+
+Here is the text that has been dragged in the UI to change
+<text_to_change>
+{text_to_change}
+</text_to_change>
+
+Here is the main query which you need to focus on and based on that update the specific section of the  current output
+<query>
+{query}
+</query>
+
+Follow all the guidelines and return 3 suggested outputs for the section above only.
+"""
+
 website_update_prompt = ChatPromptTemplate.from_messages([
     ("system", website_updatte_content_system_prompt),
     ("human", website_update_content_user_prompt),
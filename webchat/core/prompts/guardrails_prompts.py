@@ -1,5 +1,8 @@
 from langchain_core.prompts import ChatPromptTemplate
 
+# System prompts are static so providers can cache them as a shared prefix; every
+# per-request value goes in the human message. Checked by scripts/check_prompt_prefixes.py
+
 
 query_checker_system_prompt = """
 You are a senior agent who looks after which query to pass into the next stage. You will be given a 
@@ -61,15 +64,7 @@ Anything which is not related to these kind of requests or
 
 If user asks something like can you generate something of your own . What they mean is to generate from source data so this should be valid.
 Make sure when you return the reason why it has failed then it is crist and clear in a single sentence not too big.
-"""
 
-
-query_checker_user_prompt = """
-Here is the  query or request
-
-<query or request>
-{search_query_or_request}
-</query or request>
 Here are the queries that user should not be stopped from asking and the value should be 1 
 1. can you rephrase this
 2. can you change the content of this
@@ -83,6 +78,15 @@ In case the query fails then please dont give a huge response back. Give a 2 or
 Make sure when you return the reason why it has failed then it is crist and clear in a single sentence not too big.
 """
 
+
+query_checker_user_prompt = """
+Here is the  query or request
+
+<query or request>
+{search_query_or_request}
+</query or request>
+"""
+
 query_checker_prompt: ChatPromptTemplate = ChatPromptTemplate.from_messages([
     ("system", query_checker_system_prompt),
     ("human", query_checker_user_prompt),
@@ -94,10 +98,7 @@ You are a Query Validator agent. You need to analyse the query and check if in t
 The query will only be valid if they ask questions related to already generated website content and user.
 You will be given a search query and output of the website content so that you can understand the context well.
 
-Here is the website output
-<website_output>
-{website_output}
-</website_output>
+The website output is given in <website_output> in the user message.
 
 Now you need to make very sure on few things . The user cannot ask few queries
 <queries_not_to_ask>
@@ -116,14 +117,6 @@ In case the user does not violate the queries and does not ask anything from "<q
 
 Make sure when you return the reason why it has failed then it is crist and clear in a single sentence not too big.
 Make sure when you return the reason why it has failed then it is crist and clear in a single sentence not too big.
-"""
-
-
-copyright_check_user_prompt = """
-Here is your query
-<query>
-{query}
-</query>
 
 Make sure the query does not ask anything which violates the rules as per your task and based on that give score 0 or 1 accordingly.
 Make sure of the exception
@@ -154,6 +147,19 @@ In case the query fails then please dont give a huge response back. Give a 2 or
 Make sure when you return the reason why it has failed then it is crist and clear in a single sentence not too big.
 """
 
+
+copyright_check_user_prompt = """
+Here is the website output
+<website_output>
+{website_output}
+</website_output>
+
+Here is your query
+<query>
+{query}
+</query>
+"""
+
 copyright_check_prompt: ChatPromptTemplate = ChatPromptTemplate.from_messages([
     ("system", copyright_check_system_prompt),
     ("human", copyright_check_user_prompt),
@@ -169,13 +175,7 @@ Here are the guidelines which must be followed:
 ## Overview
 This document outlines the requirements for generating SEO-optimized website content elements with specific character limits, formatting rules, and content guidelines.
 
-Here is the business info:
-<business_info>
-{payload_data}
-</business_info>
-
-Here is the section you will work with:
-Section: {section}
+The business info is given in <business_info> and the section you will work with in <section>, both in the user message.
 
 ## Content Elements
 
@@ -271,7 +271,7 @@ Section: {section}
 - Reference existing website pages
 - Examples: "Get In Touch," "Schedule Consultation," "Start Conversation"
 
-Here are all the pages names: {all_pages_names}
+Here are all the pages names: see <available_pages> in the user message.
 
 **CRITICAL CTA RULES**:
 - Format MUST be: [2-4 words] [bracket content]
@@ -280,7 +280,7 @@ Here are all the pages names: {all_pages_names}
 - Format violation is STRICTLY FORBIDDEN
 
 **CTA REDIRECTION RULES (STRICT)**:
-- **CANNOT redirect to the same page**: CTA cannot redirect to the current section/page ({section})
+- **CANNOT redirect to the same page**: CTA cannot redirect to the current section/page (the section given in <section>)
 - **CANNOT redirect to home page**: CTA cannot redirect to homepage/home
 - **MUST redirect to different valid pages**: Can only redirect to other existing pages from the available pages list
 - **Example violations**: If current section is "Services", CTA cannot say "View Services [Services]" or "Go Home [Home]"
@@ -418,30 +418,10 @@ For H1 and H2 sections, be more lenient with content improvement requests that d
 
 </guidelines>
 
-After reviewing all guidelines, ensure the query does not violate ANY guideline for {section}.
+After reviewing all guidelines, ensure the query does not violate ANY guideline for the section given in <section>.
 Go through all guidelines meticulously and do not miss even a single requirement.
 Pay special attention to CTA redirection rules if the query involves CTA changes.
 Make sure when you return the reason why it has failed then it is crist and clear in a single sentence not too big.
-"""
-
-guidelines_guardrails_user_prompt = """
-Here is your query:
-<query>
-{query}
-</query>
-
-Current output on the page:
-{output}
-
-Specific section being queried:
-<section>
-{section}
-</section>
-
-Available pages for redirection:
-<available_pages>
-{all_pages_names}
-</available_pages>
 
 ## EVALUATION RULES:
 
@@ -454,11 +434,11 @@ Available pages for redirection:
 - Breaking required formatting structures
 
 ### 2. CTA Redirection Violations:
-- Requesting CTA to redirect to the same page/section ({section})
+- Requesting CTA to redirect to the same page/section (the current section)
 - Requesting CTA to redirect to home page/homepage
 - Any variation of "redirect to current page" or "go to this page"
 - Examples of BLOCKED requests:
-  * "Make CTA redirect to {section}"
+  * "Make CTA redirect to [current section]"
   * "Change CTA to go to home page"
   * "Set CTA to link to homepage"
   * "Make CTA point to the same page"
@@ -488,16 +468,16 @@ Available pages for redirection:
 - "Restructure for better flow"
 
 ### Valid CTA Redirection Queries:
-- "Change CTA to redirect to [valid_page]" (where valid_page is in available_pages but NOT {section} and NOT home/homepage)
+- "Change CTA to redirect to [valid_page]" (where valid_page is in available_pages but NOT the current section and NOT home/homepage)
 - "Make CTA go to [different_page]" (valid page from list, excluding current section and home)
 - "Set CTA to link to [other_page]" (valid page that's different from current section and not home)
 
 ## DECISION PROCESS:
 
-1. **Check Section Match**: Verify query relates to correct section ({section})
+1. **Check Section Match**: Verify query relates to correct section (the section given in <section>)
 2. **Scan for Explicit Violations**: Look for any STRICT BLOCKING criteria
 3. **CTA Redirection Check**: If query mentions CTA redirection, verify:
-   - Target page is NOT the same as current section ({section})
+   - Target page is NOT the same as current section
    - Target page is NOT home/homepage
    - Target page exists in available pages list
 4. **Evaluate Intent**: Distinguish between improvement vs. rule-breaking
@@ -508,7 +488,7 @@ If POV is in singular then it should remain in singular. If POV is plural then i
 
 **If Score 0 (Violation Found):**
 - Provide 2-3 line explanation of why it failed
-- For CTA violations, specifically mention: "CTA cannot redirect to the same page ({section}) or home page"
+- For CTA violations, specifically mention: "CTA cannot redirect to the same page ([current section]) or home page"
 - Suggest alternative valid pages from the available pages list
 - Be concise and direct
 
@@ -519,10 +499,36 @@ If POV is in singular then it should remain in singular. If POV is plural then i
 - H1 content ≠ Hero Title/Hero Text
 - No current guidelines for H1 section (skip if section is H1)  
 - CTA format is sacred - brackets cannot be touched
-- CTA redirection rules are MANDATORY - cannot redirect to same page ({section}) or home
+- CTA redirection rules are MANDATORY - cannot redirect to same page (the current section) or home
 - Content improvement ≠ guideline violation
 - Don't be tricked by "force" language - still block violations
 
+"""
+
+guidelines_guardrails_user_prompt = """
+Here is the business info:
+<business_info>
+{payload_data}
+</business_info>
+
+Available pages for redirection:
+<available_pages>
+{all_pages_names}
+</available_pages>
+
+Current output on the page:
+{output}
+
+Specific section being queried:
+<section>
+{section}
+</section>
+
+Here is your query:
+<query>
+{query}
+</query>
+
 **CTA REDIRECTION VALIDATION:**
 Current section: {section}
 Forbidden redirections: {section}, home, homepage
@@ -536,3 +542,61 @@ guidelines_guardrails_prompt = ChatPromptTemplate.from_messages([
     ("system", guidelines_guardrails_system_prompt),
     ("human", guidelines_guardrails_user_prompt),
 ])
+
+
+combined_guardrails_header_prompt = """You are a guardrail agent who runs several independent checks on one user query in a single pass.
+Each check below has its own instructions. Judge every check on its own, exactly as its instructions say,
+and fill in the matching score and reason fields (query_score/query_reason, copyright_score/copyright_reason,
+guidelines_score/guidelines_reason). Only run the checks that are listed in this prompt and leave the
+fields of any other check null or empty.
+Set the overall score to 0 if any check scored 0, otherwise 1. The overall reason is the reason of the
+first failing check in the order query, copyright, guidelines, or "" if all checks pass.
+"""
+
+combined_guardrails_system_prompt = (
+    combined_guardrails_header_prompt
+    + "\n<query_check>\n"
+    + query_checker_system_prompt
+    + "\n</query_check>\n\n<guidelines_check>\n"
+    + guidelines_guardrails_system_prompt
+    + "\n</guidelines_check>\n"
+)
+
+combined_guardrails_copyright_system_prompt = (
+    combined_guardrails_header_prompt
+    + "\n<query_check>\n"
+    + query_checker_system_prompt
+    + "\n</query_check>\n\n<copyright_check>\n"
+    + copyright_check_system_prompt
+    + "\n</copyright_check>\n\n<guidelines_check>\n"
+    + guidelines_guardrails_system_prompt
+    + "\n</guidelines_check>\n"
+)
+
+combined_guardrails_user_prompt = (
+    "\n<query_check>\n"
+    + query_checker_user_prompt
+    + "\n</query_check>\n\n<guidelines_check>\n"
+    + guidelines_guardrails_user_prompt
+    + "\n</guidelines_check>\n"
+)
+
+combined_guardrails_copyright_user_prompt = (
+    "\n<query_check>\n"
+    + query_checker_user_prompt
+    + "\n</query_check>\n\n<copyright_check>\n"
+    + copyright_check_user_prompt
+    + "\n</copyright_check>\n\n<guidelines_check>\n"
+    + guidelines_guardrails_user_prompt
+    + "\n</guidelines_check>\n"
+)
+
+combined_guardrails_prompt = ChatPromptTemplate.from_messages([
+    ("system", combined_guardrails_system_prompt),
+    ("human", combined_guardrails_user_prompt),
+])
+
+combined_guardrails_copyright_prompt = ChatPromptTemplate.from_messages([
+    ("system", combined_guardrails_copyright_system_prompt),
+    ("human", combined_guardrails_copyright_user_prompt),
+])
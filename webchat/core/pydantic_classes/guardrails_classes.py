@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import List, Union
+from typing import List, Optional, Union
 
 
 class QueryValidator(BaseModel):
@@ -12,6 +12,31 @@ class QueryValidator(BaseModel):
     )
 
 
+class CombinedGuardrailValidator(QueryValidator):
+    query_score: int = Field(
+        ..., description="Score 0 if the query check fails and 1 if it passes"
+    )
+    query_reason: str = Field(
+        default="",
+        description='Empty string "" if query_score is 1, otherwise a single sentence reason',
+    )
+    copyright_score: Optional[int] = Field(
+        default=None,
+        description="Score 0 if the copyright check fails and 1 if it passes. Leave null if the copyright check is not part of this request",
+    )
+    copyright_reason: str = Field(
+        default="",
+        description='Empty string "" if copyright_score is 1 or null, otherwise a single sentence reason',
+    )
+    guidelines_score: int = Field(
+        ..., description="Score 0 if the guidelines check fails and 1 if it passes"
+    )
+    guidelines_reason: str = Field(
+        default="",
+        description='Empty string "" if guidelines_score is 1, otherwise a single sentence reason',
+    )
+
+
 class H2Section(BaseModel):
     H2_Heading: str = Field(..., alias="H2 Heading")
     H2_Content: Union[str, List[str]] = Field(..., alias="H2 Content")
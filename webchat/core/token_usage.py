@@ -0,0 +1,198 @@
+"""
+Token accounting for the LLM chains.
+
+ainvoke_chain records the prompt, cached-prompt and completion tokens the provider
+reports for every call. Streamed calls, whose usage the output parser drops, are
+recorded with the chars/token estimate and counted as estimated. Totals are kept per
+chain, per section kind and per action type.
+
+The section and action type of a call come from usage_labels, which the API layer sets
+once per request; validator and generation tasks inherit it with the rest of the
+request's context, so the chain helpers need no extra parameters. Both come from the
+client, so set_usage_labels maps anything outside the page schema and the known actions
+to "other" to keep the number of counters and metric series bounded.
+"""
+
+import hashlib
+import os
+import tempfile
+from collections import defaultdict
+from contextvars import ContextVar
+from typing import Any, Callable, Collection, Dict, Optional, Tuple
+
+from webchat.core.page_schema import SECTION_KEYS, section_kind
+
+UNLABELLED = "unknown"
+# Label of sections and actions the server does not know
+OTHER = "other"
+# Action label of free-form questions
+QUESTION_ACTION = "question"
+APPLY_SELECTION_ACTION = "apply-selection"
+
+# (section kind, action type) of the request being served
+usage_labels: ContextVar[Tuple[str, str]] = ContextVar(
+    "usage_labels", default=(UNLABELLED, UNLABELLED)
+)
+
+
+def section_label(section: Optional[str]) -> str:
+    if not section:
+        return UNLABELLED
+    kind = section_kind(section)
+    return kind if kind in SECTION_KEYS else OTHER
+
+
+def action_label(action_type: Optional[str], actions: Collection[str]) -> str:
+    if not action_type:
+        return QUESTION_ACTION
+    if action_type == APPLY_SELECTION_ACTION or action_type in actions:
+        return action_type
+    return OTHER
+
+
+def set_usage_labels(
+    section: Optional[str], action_type: Optional[str], actions: Collection[str] = ()
+) -> None:
+    """
+    Label the current request's LLM calls. Section names are reduced to their kind;
+    action types other than apply-selection and those in actions become "other"
+    """
+    usage_labels.set((section_label(section), action_label(action_type, actions)))
+
+
+class UsageCounter:
+    __slots__ = (
+        "calls",
+        "prompt_tokens",
+        "cached_prompt_tokens",
+        "completion_tokens",
+        "estimated_calls",
+    )
+
+    def __init__(self):
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.cached_prompt_tokens = 0
+        self.completion_tokens = 0
+        self.estimated_calls = 0
+
+    def add(self, prompt_tokens, completion_tokens, cached_prompt_tokens, estimated):
+        self.calls += 1
+        self.prompt_tokens += prompt_tokens
+        self.cached_prompt_tokens += cached_prompt_tokens
+        self.completion_tokens += completion_tokens
+        self.estimated_calls += int(estimated)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "prompt_tokens": self.prompt_tokens,
+            "cached_prompt_tokens": self.cached_prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "avg_prompt_tokens": self.prompt_tokens / self.calls if self.calls else 0.0,
+            "avg_completion_tokens": (
+                self.completion_tokens / self.calls if self.calls else 0.0
+            ),
+            "estimated_calls": self.estimated_calls,
+        }
+
+
+class TokenUsage:
+    def __init__(self):
+        self.total = UsageCounter()
+        self.by_chain: Dict[str, UsageCounter] = defaultdict(UsageCounter)
+        self.by_section: Dict[str, UsageCounter] = defaultdict(UsageCounter)
+        self.by_action: Dict[str, UsageCounter] = defaultdict(UsageCounter)
+
+    def record(
+        self,
+        chain: str,
+        prompt_tokens: int,
+        completion_tokens: int,
+        cached_prompt_tokens: int = 0,
+        estimated: bool = False,
+    ) -> None:
+        section, action_type = usage_labels.get()
+        counts = (prompt_tokens, completion_tokens, cached_prompt_tokens, estimated)
+        self.total.add(*counts)
+        self.by_chain[chain].add(*counts)
+        self.by_section[section].add(*counts)
+        self.by_action[action_type].add(*counts)
+
+    def clear(self) -> None:
+        self.__init__()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "total": self.total.as_dict(),
+            "by_chain": {k: v.as_dict() for k, v in sorted(self.by_chain.items())},
+            "by_section": {k: v.as_dict() for k, v in sorted(self.by_section.items())},
+            "by_action": {k: v.as_dict() for k, v in sorted(self.by_action.items())},
+        }
+
+
+token_usage = TokenUsage()
+
+
+def reported_usage(message: Any) -> Optional[Tuple[int, int, int]]:
+    """(prompt, completion, cached prompt) tokens of an AIMessage, if the provider sent them"""
+    usage = getattr(message, "usage_metadata", None)
+    if not usage:
+        return None
+    cached = (usage.get("input_token_details") or {}).get("cache_read") or 0
+    return usage.get("input_tokens", 0), usage.get("output_tokens", 0), cached
+
+
+# Where tiktoken downloads its BPE files from; a file is cached under the sha1 of its URL
+TIKTOKEN_BLOB_URL = "https://openaipublic.blob.core.windows.net/encodings/{}.tiktoken"
+
+
+def tiktoken_cache_dir() -> str:
+    """tiktoken's cache directory, resolved the way tiktoken.load does; "" disables it"""
+    if "TIKTOKEN_CACHE_DIR" in os.environ:
+        return os.environ["TIKTOKEN_CACHE_DIR"]
+    if "DATA_GYM_CACHE_DIR" in os.environ:
+        return os.environ["DATA_GYM_CACHE_DIR"]
+    return os.path.join(tempfile.gettempdir(), "data-gym-cache")
+
+
+def cached_encoding_path(encoding_name: str) -> Optional[str]:
+    """Path of the encoding's BPE file in tiktoken's cache, or None if it is not there"""
+    cache_dir = tiktoken_cache_dir()
+    if not cache_dir:
+        return None
+    url = TIKTOKEN_BLOB_URL.format(encoding_name)
+    path = os.path.join(cache_dir, hashlib.sha1(url.encode()).hexdigest())
+    return path if os.path.isfile(path) else None
+
+
+def token_counter(model: str, chars_per_token: int) -> Tuple[Callable[[str], int], str]:
+    """
+    (count function, description) for offline tools. tiktoken is used only when the
+    model's encoding is already in its local cache, so this never downloads anything;
+    otherwise tokens are estimated as chars/token and the description says why.
+    """
+    estimate = f"chars/{chars_per_token}"
+
+    def estimated(reason: str) -> Tuple[Callable[[str], int], str]:
+        return lambda text: len(text) // chars_per_token, f"{estimate} ({reason})"
+
+    try:
+        import tiktoken
+    except ImportError:
+        return estimated("tiktoken is not installed")
+    try:
+        encoding_name = tiktoken.encoding_name_for_model(model)
+    except KeyError:
+        return estimated(f"tiktoken has no encoding for model {model}")
+    if not tiktoken_cache_dir():
+        return estimated("the tiktoken cache is disabled")
+    if cached_encoding_path(encoding_name) is None:
+        return estimated(
+            f"{encoding_name} is not in the tiktoken cache at {tiktoken_cache_dir()}"
+        )
+    try:
+        encoding = tiktoken.get_encoding(encoding_name)
+    except ValueError as e:
+        return estimated(f"could not load {encoding_name}: {e}")
+    return lambda text: len(encoding.encode(text)), f"tiktoken {encoding_name}"
@@ -0,0 +1,76 @@
+"""
+Per-request structured trace events for the page update path.
+
+Call sites guard every event with the TRACING constant:
+
+    if TRACING:
+        trace("field_not_found", section=section, fields=list(page))
+
+With WEBCHAT_TRACE off that is one global lookup and a branch, and the event arguments
+are never built. With it on, events go to a ring buffer that traced() opens for each
+request. The buffer keeps the last WEBCHAT_TRACE_BUFFER_SIZE events and is shared by
+the tasks the request starts. A failed response ({"success": False, ...}) gets the
+buffer as its "trace" field.
+"""
+
+import functools
+import time
+from collections import deque
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+
+from webchat.settings import TRACE_ENABLED, TRACE_BUFFER_SIZE
+
+TRACING = TRACE_ENABLED
+
+
+class TraceBuffer:
+    __slots__ = ("started", "events")
+
+    def __init__(self, size: int = TRACE_BUFFER_SIZE):
+        self.started = time.perf_counter()
+        self.events: deque = deque(maxlen=size)
+
+
+trace_buffer: ContextVar[Optional[TraceBuffer]] = ContextVar(
+    "trace_buffer", default=None
+)
+
+
+def trace(event: str, **fields: Any) -> None:
+    """Record an event in the current request's buffer; dropped outside a request"""
+    buffer = trace_buffer.get()
+    if buffer is None:
+        return
+    elapsed_ms = round((time.perf_counter() - buffer.started) * 1e3, 3)
+    buffer.events.append({"event": event, "ms": elapsed_ms, **fields})
+
+
+def start_trace() -> None:
+    """Give the current request a fresh buffer"""
+    trace_buffer.set(TraceBuffer())
+
+
+def trace_events() -> List[Dict[str, Any]]:
+    buffer = trace_buffer.get()
+    return list(buffer.events) if buffer is not None else []
+
+
+def attach_trace(response: Any) -> Any:
+    """Add the request's events to a failed response dict"""
+    if TRACING and isinstance(response, dict) and not response.get("success"):
+        response["trace"] = trace_events()
+    return response
+
+
+def traced(handler):
+    """Decorator: trace an async handler returning a response dict"""
+    if not TRACING:
+        return handler
+
+    @functools.wraps(handler)
+    async def wrapper(*args, **kwargs):
+        start_trace()
+        return attach_trace(await handler(*args, **kwargs))
+
+    return wrapper
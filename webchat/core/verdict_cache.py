@@ -0,0 +1,91 @@
+"""
+LRU + TTL cache for guardrail verdicts.
+
+Validators run at temperature 0, so the same query checked against the same context gets
+the same verdict. Keys are built from the normalized query, the section and a hash of
+the page/payload context the validator prompt actually sees, so a repeated check (a
+preset action clicked twice, the same free-form question on an unchanged page) skips
+the LLM call entirely.
+"""
+
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from webchat.settings import VERDICT_CACHE_SIZE, VERDICT_CACHE_TTL
+
+
+def normalize_query(query: str) -> str:
+    """Case-fold and collapse whitespace so trivially different spellings share a key"""
+    return " ".join(str(query).split()).casefold()
+
+
+def content_hash(*values: Any) -> str:
+    """Stable hash of JSON-like context values"""
+    digest = hashlib.blake2b(digest_size=16)
+    for value in values:
+        digest.update(
+            json.dumps(value, sort_keys=True, ensure_ascii=False, default=str).encode()
+        )
+        digest.update(b"\x00")
+    return digest.hexdigest()
+
+
+class VerdictCache:
+    def __init__(
+        self, max_size: int = VERDICT_CACHE_SIZE, ttl: float = VERDICT_CACHE_TTL
+    ):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.entries: "OrderedDict[Tuple, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 0 and self.ttl > 0
+
+    def get(self, key: Tuple) -> Optional[Dict[str, Any]]:
+        if not self.enabled:
+            return None
+        entry = self.entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del self.entries[key]
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        # Callers may mutate the verdict they get back
+        return dict(entry[1])
+
+    def set(self, key: Tuple, verdict: Dict[str, Any]) -> None:
+        if not self.enabled:
+            return
+        self.entries[key] = (time.monotonic() + self.ttl, dict(verdict))
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self) -> None:
+        self.entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "size": len(self.entries),
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+verdict_cache = VerdictCache()
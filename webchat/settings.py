@@ -0,0 +1,126 @@
+"""
+Runtime settings for the webchat workflow, read from the environment and .env
+"""
+
+import os
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+def env_bool(name: str, default: bool = False) -> bool:
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def env_int(name: str, default: int) -> int:
+    value = os.getenv(name)
+    if value is None or not value.strip():
+        return default
+    return int(value)
+
+
+def env_float(name: str, default: float) -> float:
+    value = os.getenv(name)
+    if value is None or not value.strip():
+        return default
+    return float(value)
+
+
+# Start return_updated_wesite alongside the guardrail validators instead of after them
+SPECULATIVE_GENERATION = env_bool("WEBCHAT_SPECULATIVE_GENERATION")
+
+# Judge the query, copyright and guidelines checks in one structured-output call
+COMBINED_GUARDRAILS = env_bool("WEBCHAT_COMBINED_GUARDRAILS")
+
+# Shared LLM client and its HTTP connection pool
+LLM_MODEL = os.getenv("WEBCHAT_LLM_MODEL", "gpt-4.1")
+LLM_MAX_RETRIES = env_int("WEBCHAT_LLM_MAX_RETRIES", 3)
+LLM_TIMEOUT = env_float("WEBCHAT_LLM_TIMEOUT", 600.0)
+LLM_CONNECT_TIMEOUT = env_float("WEBCHAT_LLM_CONNECT_TIMEOUT", 5.0)
+LLM_MAX_CONNECTIONS = env_int("WEBCHAT_LLM_MAX_CONNECTIONS", 100)
+LLM_MAX_KEEPALIVE_CONNECTIONS = env_int("WEBCHAT_LLM_MAX_KEEPALIVE_CONNECTIONS", 20)
+LLM_KEEPALIVE_EXPIRY = env_float("WEBCHAT_LLM_KEEPALIVE_EXPIRY", 60.0)
+# HTTP/2 is only used when the optional h2 package is installed (pip install httpx[http2])
+LLM_HTTP2 = env_bool("WEBCHAT_LLM_HTTP2", True)
+
+# LLM backend: live (OpenAI), record (live, saving every output to the cassette
+# directory), replay (outputs served from the cassette directory) or fake (synthesized
+# schema-valid outputs). replay and fake need no network or API key.
+LLM_MODE = os.getenv("WEBCHAT_LLM_MODE", "live").strip().lower()
+LLM_CASSETTE_DIR = os.getenv("WEBCHAT_LLM_CASSETTE_DIR", "cassettes")
+# Latency of replayed and fake calls in seconds: a number, "recorded" (replay only),
+# uniform:LOW:HIGH, normal:MEAN:STDDEV or lognormal:MEDIAN:SIGMA. Empty means
+# "recorded" for replay and 0 for fake.
+LLM_SYNTHETIC_LATENCY = os.getenv("WEBCHAT_LLM_SYNTHETIC_LATENCY", "")
+LLM_SYNTHETIC_SEED = env_int("WEBCHAT_LLM_SYNTHETIC_SEED", 0)
+# In replay mode, synthesize an output for prompts that were never recorded instead of failing
+LLM_REPLAY_FAKE_MISSING = env_bool("WEBCHAT_LLM_REPLAY_FAKE_MISSING")
+# Fake validators reject queries matching this regex (case-insensitive) and pass the rest
+LLM_FAKE_REJECT_PATTERN = os.getenv("WEBCHAT_LLM_FAKE_REJECT_PATTERN", "")
+
+# Admission control for LLM calls (0 disables the RPM/TPM budgets)
+LLM_RPM_LIMIT = env_float("WEBCHAT_LLM_RPM_LIMIT", 0)
+LLM_TPM_LIMIT = env_float("WEBCHAT_LLM_TPM_LIMIT", 0)
+LLM_INITIAL_CONCURRENCY = env_int("WEBCHAT_LLM_INITIAL_CONCURRENCY", 16)
+LLM_MIN_CONCURRENCY = env_int("WEBCHAT_LLM_MIN_CONCURRENCY", 2)
+LLM_MAX_CONCURRENCY = env_int("WEBCHAT_LLM_MAX_CONCURRENCY", 64)
+# Calls slower than this (seconds) count as congestion; 0 reacts to 429s only
+LLM_LATENCY_TARGET = env_float("WEBCHAT_LLM_LATENCY_TARGET", 45.0)
+LLM_BACKOFF_FACTOR = env_float("WEBCHAT_LLM_BACKOFF_FACTOR", 0.7)
+# Completion tokens reserved per call when estimating the token budget
+LLM_COMPLETION_TOKEN_ESTIMATE = env_int("WEBCHAT_LLM_COMPLETION_TOKEN_ESTIMATE", 800)
+
+# Guardrail verdict cache (0 for either value disables it)
+VERDICT_CACHE_SIZE = env_int("WEBCHAT_VERDICT_CACHE_SIZE", 2048)
+VERDICT_CACHE_TTL = env_float("WEBCHAT_VERDICT_CACHE_TTL", 3600.0)
+
+# Server-held document sessions
+SESSION_TTL = env_float("WEBCHAT_SESSION_TTL", 3600.0)
+SESSION_MAX_COUNT = env_int("WEBCHAT_SESSION_MAX_COUNT", 1000)
+SESSION_HISTORY_SIZE = env_int("WEBCHAT_SESSION_HISTORY_SIZE", 20)
+
+# Section-scoped prompt context: send only the fields a section's prompts need
+PROMPT_CONTEXT_SLICING = env_bool("WEBCHAT_PROMPT_CONTEXT_SLICING", True)
+# Approximate token budget for the sliced page, left panel and business info together
+PROMPT_CONTEXT_TOKEN_BUDGET = env_int("WEBCHAT_PROMPT_CONTEXT_TOKEN_BUDGET", 3000)
+# H2 sections on each side of the edited one that are sent in full
+PROMPT_CONTEXT_H2_NEIGHBOURS = env_int("WEBCHAT_PROMPT_CONTEXT_H2_NEIGHBOURS", 1)
+
+# Full LLM payload logging: written by a background thread to gzip-rotated files, and
+# only serialized when WEBCHAT_PAYLOAD_LOG_LEVEL lets DEBUG records through
+PAYLOAD_LOG_LEVEL = os.getenv("WEBCHAT_PAYLOAD_LOG_LEVEL", "WARNING").strip().upper()
+# Fraction of enabled payloads that are actually logged
+PAYLOAD_LOG_SAMPLE_RATE = env_float("WEBCHAT_PAYLOAD_LOG_SAMPLE_RATE", 1.0)
+PAYLOAD_LOG_FILE = os.getenv("WEBCHAT_PAYLOAD_LOG_FILE", "logs/payloads.log")
+PAYLOAD_LOG_MAX_BYTES = env_int("WEBCHAT_PAYLOAD_LOG_MAX_BYTES", 10 * 1024 * 1024)
+PAYLOAD_LOG_BACKUP_COUNT = env_int("WEBCHAT_PAYLOAD_LOG_BACKUP_COUNT", 5)
+
+# Structured trace events (field resolved, H2 section patched, field not found, ...)
+# kept per request and attached to failed responses. Off: each call site is one branch
+TRACE_ENABLED = env_bool("WEBCHAT_TRACE")
+# Most recent events kept per request
+TRACE_BUFFER_SIZE = env_int("WEBCHAT_TRACE_BUFFER_SIZE", 64)
+
+# Default request deadlines in seconds (0 for none); an X-Request-Deadline header can
+# only shorten them. LLM calls still running at the deadline are cancelled
+ASK_AI_DEADLINE = env_float("WEBCHAT_ASK_AI_DEADLINE", 120.0)
+ASK_AI_STREAM_DEADLINE = env_float("WEBCHAT_ASK_AI_STREAM_DEADLINE", 180.0)
+
+# Hedged requests: for these chains (comma-separated, e.g. "updated_website") a call
+# that runs past the chain's observed latency quantile gets an identical second call;
+# the first result wins and the other call is cancelled
+HEDGED_CHAINS = tuple(
+    name.strip()
+    for name in os.getenv("WEBCHAT_HEDGED_CHAINS", "").split(",")
+    if name.strip()
+)
+HEDGE_QUANTILE = env_float("WEBCHAT_HEDGE_QUANTILE", 0.9)
+# At most this fraction of a chain's calls may be hedged
+HEDGE_BUDGET = env_float("WEBCHAT_HEDGE_BUDGET", 0.1)
+# Latencies kept per chain, and how many are needed before hedging starts
+HEDGE_WINDOW = env_int("WEBCHAT_HEDGE_WINDOW", 200)
+HEDGE_MIN_SAMPLES = env_int("WEBCHAT_HEDGE_MIN_SAMPLES", 20)
@@ -0,0 +1,125 @@
+"""
+Batched patch engine for page updates.
+
+process_response_updates used to apply every update on its own: copy the whole page
+list, scan it for the page by lowercased name and rescan the page keys for the field.
+Here a response is compiled once into resolved field paths and then applied in a single
+pass that copies only the touched page and the touched H2 sections; every other page
+and section is shared with the input.
+
+Field names resolve through the page schema (webchat/core/page_schema.py), like
+find_exact_field_name, and later updates to the same field win, as before.
+"""
+
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from webchat.core.page_schema import FieldPath, H2_PATH_RE, resolve_field
+from webchat.core.trace import TRACING, trace
+
+Patch = Tuple[FieldPath, Any]
+
+H2_SECTIONS = {"H2 Content", "H2 Heading"}
+
+
+def compile_h2_patch(page, index, field, value) -> Optional[Patch]:
+    sections = page.get("h2_sections")
+    if not sections or not isinstance(index, int) or not 0 <= index < len(sections):
+        return None
+    exact_field = resolve_field(sections[index], field)
+    if exact_field is None:
+        return None
+    return ("h2_sections", index, exact_field), value
+
+
+def compile_patches(page: Dict[str, Any], response: Sequence[Dict[str, Any]]):
+    """
+    Resolve every update in response against page.
+
+    Returns (patches, unresolved): the (path, value) pairs to apply, in order, and the
+    updates whose field could not be found.
+    """
+    patches: List[Patch] = []
+    unresolved: List[Dict[str, Any]] = []
+    for update in response:
+        section = update.get("section") or ""
+        value = update.get("updated_text")
+
+        if not section:
+            patch = None
+        elif section in H2_SECTIONS:
+            patch = compile_h2_patch(page, update.get("index"), section, value)
+        elif H2_PATH_RE.match(section):
+            # "h2_sections[1].H2 Content"
+            match = H2_PATH_RE.match(section)
+            patch = compile_h2_patch(page, int(match.group(1)), match.group(2), value)
+        else:
+            exact_field = resolve_field(page, section)
+            patch = ((exact_field,), value) if exact_field else None
+
+        if patch is None:
+            unresolved.append(update)
+            if TRACING:
+                trace(
+                    "field_not_found",
+                    section=section,
+                    index=update.get("index"),
+                    fields=list(page),
+                )
+        else:
+            patches.append(patch)
+            if TRACING:
+                path = patch[0]
+                if len(path) == 3:
+                    trace("h2_patched", section=section, index=path[1], field=path[2])
+                else:
+                    trace("field_resolved", section=section, field=path[0])
+    return patches, unresolved
+
+
+def apply_patches(page: Dict[str, Any], patches: Sequence[Patch]) -> Dict[str, Any]:
+    """New page with patches applied; copies the page and each touched H2 section once"""
+    if not patches:
+        return page
+    new_page = dict(page)
+    copied_sections: Dict[int, Dict[str, Any]] = {}
+    for path, value in patches:
+        if len(path) == 1:
+            new_page[path[0]] = value
+            continue
+        _, index, field = path
+        if not copied_sections:
+            new_page["h2_sections"] = list(page["h2_sections"])
+        section = copied_sections.get(index)
+        if section is None:
+            section = copied_sections[index] = dict(page["h2_sections"][index])
+            new_page["h2_sections"][index] = section
+        section[field] = value
+    return new_page
+
+
+def find_page(pages_data: Sequence[Dict[str, Any]], page_name: str) -> int:
+    """Index of the first page named page_name (case-insensitive), or -1"""
+    page_name_lower = (page_name or "").lower()
+    for index, page in enumerate(pages_data):
+        if page.get("Page Name", "").lower() == page_name_lower:
+            return index
+    return -1
+
+
+def patch_pages(
+    pages_data: Sequence[Dict[str, Any]],
+    response: Sequence[Dict[str, Any]],
+    page_name: str,
+) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """
+    Apply all updates in response to the page named page_name in one pass.
+
+    Returns (new pages list, unresolved updates). Pages other than the target are shared.
+    """
+    index = find_page(pages_data, page_name)
+    if index < 0:
+        return list(pages_data), list(response)
+    patches, unresolved = compile_patches(pages_data[index], response)
+    updated_data = list(pages_data)
+    updated_data[index] = apply_patches(pages_data[index], patches)
+    return updated_data, unresolved
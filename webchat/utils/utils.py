@@ -1,38 +1,70 @@
+import logging
 from typing import Any
 
+from webchat.core.documents import (
+    PageLocation,
+    find_page_index,
+    merge_page,
+    page_positions,
+    payload_index,
+    remember_index,
+)
+from webchat.core.page_schema import apply_section_value, resolve_field
+from webchat.core.trace import TRACING, trace
+from webchat.utils.patches import patch_pages
 
-async def extract_key_info(payload_data, model_output, page_name) -> Any:
+logger = logging.getLogger(__name__)
+
+
+def locate_page(payload_data, model_output, page_name) -> PageLocation:
+    """
+    Find page_name (case-insensitive) in both inputs through the cached page indexes
+    of this site version instead of scanning the page lists.
+    """
     page_name_lower = page_name.lower()
 
-    # Find matching page in model_output (case-insensitive)
-    main_output = None
-    for i in model_output:
-        page = i.get("pages", [{}])[0]
-        if page.get("Page Name", "").lower() == page_name_lower:
-            main_output = i["pages"]
-            break
+    # Find matching page in model_output
+    position = find_page_index(model_output, page_name_lower)
+    main_output = model_output[position].get("pages") if position >= 0 else None
 
     # Find matching page in payload_data["pages"]
-    left_panel = None
-    for i in payload_data.get("pages", []):
-        if i.get("title", "").lower() == page_name_lower:
-            left_panel = i
-            break
+    index = payload_index(payload_data)
+    left_panel = index.left_panels.get(page_name_lower)
 
     # Guard for missing page
     if main_output is None or left_panel is None:
+        if TRACING:
+            trace(
+                "page_not_found",
+                page=page_name,
+                in_model_output=main_output is not None,
+                in_payload=left_panel is not None,
+            )
         raise ValueError(f"Page '{page_name}' not found in one of the inputs.")
 
+    return PageLocation(position, main_output, left_panel, index.business_info)
+
+
+async def extract_key_info(payload_data, model_output, page_name) -> Any:
+    location = locate_page(payload_data, model_output, page_name)
+
     # Get optional keys safely
-    if_copyright = left_panel.get("copy", "")
-    business_info = {k: v for k, v in payload_data.items() if k.lower() != "pages"}
+    if_copyright = location.left_panel.get("copy", "")
 
-    return main_output, left_panel, if_copyright, business_info
+    return (
+        location.main_output,
+        location.left_panel,
+        if_copyright,
+        location.business_info,
+    )
 
 
 def update_page_content(model_output, updated_pages):
     """
-    Update the model_output with the updated page content.
+    Return a new model_output with the updated page content merged in.
+
+    Copy-on-write: model_output and its pages are never modified (callers may pass shared
+    data such as the test sets); only the changed entry and page are rebuilt.
     """
     # Flatten the incoming list if needed
     updated_page = updated_pages[0]
@@ -40,14 +72,26 @@ def update_page_content(model_output, updated_pages):
         "Page Name"
     )  # Fixed: use "Page Name" not "Page_Name"
 
-    for outer_dict in model_output:
+    # The page index of this model_output version gives the usual position directly;
+    # the scan only runs for pages that are not the first of their entry
+    position = find_page_index(model_output, str(updated_page_name))
+    candidates = [position] if position >= 0 else []
+    candidates += range(len(model_output))
+
+    for index in candidates:
+        outer_dict = model_output[index]
         for i, page in enumerate(outer_dict.get("pages", [])):
             if page.get("Page Name") == updated_page_name:
                 # Update the page with new content, preserving structure
-                for key, value in updated_page.items():
-                    if value is not None:
-                        page[key] = value
-                return model_output
+                new_entry = dict(outer_dict)
+                new_entry["pages"] = list(outer_dict["pages"])
+                new_entry["pages"][i] = merge_page(page, updated_page)
+                new_output = list(model_output)
+                new_output[index] = new_entry
+                # The page matched by exact name, so page names are unchanged and the
+                # new version shares the position index
+                remember_index("positions", new_output, page_positions(model_output))
+                return new_output
 
     return model_output
 
@@ -64,25 +108,11 @@ def remove_none_values(data):
 def find_exact_field_name(page, section_name):
     """
     Find the exact field name in the page data with flexible matching.
-    """
-    # First try exact match
-    if section_name in page:
-        return section_name
-
-    # Then try case-insensitive match
-    for field_name in page.keys():
-        if field_name.lower() == section_name.lower():
-            return field_name
-
-    # Handle special cases for fields with additional text in parentheses
-    section_lower = section_name.lower()
-    for field_name in page.keys():
-        field_lower = field_name.lower()
-        # Check if the section name is contained in the field name (for cases like "Meta Description" -> "Meta Description (70 to 143 Characters)")
-        if section_lower in field_lower or field_lower.startswith(section_lower):
-            return field_name
 
-    return None
+    Known fields, their aliases and API keys resolve through the page schema lookup
+    tables; anything else falls back to cached case-insensitive/substring matching.
+    """
+    return resolve_field(page, section_name)
 
 
 def update_page_data(pages_data, page_name, section_name, new_value):
@@ -113,6 +143,10 @@ def update_page_data(pages_data, page_name, section_name, new_value):
                         )
                         if exact_field:
                             page["h2_sections"][index][exact_field] = new_value
+                            if TRACING:
+                                trace("h2_patched", index=index, field=exact_field)
+                        elif TRACING:
+                            trace("field_not_found", section=section_name, index=index)
                 else:
                     exact_field = find_exact_field_name(page, section_name)
                     if exact_field:
@@ -122,12 +156,15 @@ def update_page_data(pages_data, page_name, section_name, new_value):
                 exact_field = find_exact_field_name(page, section_name)
                 if exact_field:
                     page[exact_field] = new_value
-                    print(f"✓ Updated field '{exact_field}' with value: {new_value}")
-                else:
-                    print(
-                        f"⚠️  Could not find field for section: '{section_name}' in page '{page_name}'"
+                    if TRACING:
+                        trace("field_resolved", section=section_name, field=exact_field)
+                elif TRACING:
+                    trace(
+                        "field_not_found",
+                        section=section_name,
+                        page=page_name,
+                        fields=list(page.keys()),
                     )
-                    print(f"Available fields: {list(page.keys())}")
             break
 
     return updated_data
@@ -155,6 +192,10 @@ def update_h2_section_content(
                 )
                 if exact_field:
                     page["h2_sections"][section_index][exact_field] = new_value
+                    if TRACING:
+                        trace("h2_patched", index=section_index, field=exact_field)
+                elif TRACING:
+                    trace("field_not_found", section=field_name, index=section_index)
             break
 
     return updated_data
@@ -182,37 +223,27 @@ def process_response_updates(pages_data, response, page_name=None):
     if page_name is None:
         if len(pages_data) > 0:
             page_name = pages_data[0].get("Page Name", "Unknown")
-            print(f"ℹ️  No page name specified. Using first page: '{page_name}'")
-
-    print(f"Processing {len(response)} updates for page: '{page_name}'")
-
-    for update in response:
-        updated_text = update.get("updated_text")
-        index = update.get("index")
-        section = update.get("section")
-
-        print(f"Processing update: section='{section}', index={index}")
-
-        if section == "H2 Content":
-            # Update h2 section content using the index
-            updated_data = update_h2_section_content(
-                updated_data, page_name, index, "H2 Content", updated_text
-            )
-            print(f"✓ Updated H2 Content at index {index}")
-
-        elif section == "H2 Heading":
-            # Update h2 section heading using the index
-            updated_data = update_h2_section_content(
-                updated_data, page_name, index, "H2 Heading", updated_text
-            )
-            print(f"✓ Updated H2 Heading at index {index}")
-
-        else:
-            # For other sections, use the section name directly with flexible matching
-            updated_data = update_page_data(
-                updated_data, page_name, section, updated_text
-            )
-            print(f"✓ Processed update for section: {section}")
+            if TRACING:
+                trace("default_page", page=page_name)
+
+    # Resolve every update once, then apply them in a single copy-on-write pass
+    updated_data, unresolved = patch_pages(updated_data, response, page_name)
+    if unresolved:
+        sections = ", ".join(
+            f"{update.get('section')} (index={update.get('index')})"
+            for update in unresolved
+        )
+        logger.warning(
+            f"Could not find fields for {len(unresolved)} of {len(response)} updates "
+            f"in page '{page_name}': {sections}"
+        )
+    if TRACING:
+        trace(
+            "updates_applied",
+            page=page_name,
+            applied=len(response) - len(unresolved),
+            total=len(response),
+        )
 
     return updated_data
 
@@ -220,11 +251,8 @@ def process_response_updates(pages_data, response, page_name=None):
 """
 Utility functions for handling suggestion selection and application
 """
-import logging
 from typing import Dict, Any, List
 
-logger = logging.getLogger(__name__)
-
 
 def create_updated_content_from_selection(
     original_content: Dict[str, Any], selection: Dict[str, Any]
@@ -248,35 +276,16 @@ def create_updated_content_from_selection(
 
         logger.info(f"Applying selection: {section} -> {selected_output}")
 
-        # Map section names to actual field names in the content
-        section_field_mapping = {
-            "Meta Title": "Meta Title (30 to 60 Characters)",
-            "Meta Description": "Meta Description (70 to 143 Characters)",
-            "Hero Title": "Hero Title (20 to 70 Characters)",
-            "Hero Text": "Hero Text (50 to 100 Characters)",
-            "Hero CTA": "Hero CTA",
-            "H1": "H1 (30 to 70 Characters)",
-            "H1 Content": "H1 Content",
-            "Header": "Header",
-            "Leading Sentence": "Leading Sentence",
-            "CTA Button": "CTA Button",
-            "Image Recommendations": "Image Recommendations",
-        }
-
-        # Get the correct field name
-        field_name = section_field_mapping.get(section, section)
-
-        # Apply the selection
-        if field_name in updated_content:
-            updated_content[field_name] = selected_output
-            logger.info(f"Successfully updated {field_name}")
-        elif section.startswith("H2") and "h2_sections" in updated_content:
-            # Handle H2 sections
-            updated_content = handle_h2_section_update(
-                updated_content, section, selected_output
-            )
+        # Resolve the section (including "H2 Heading (Section 2)" style identifiers)
+        # through the page schema; only the containers along the path are copied
+        resolved_content = apply_section_value(
+            original_content, section, selected_output
+        )
+        if resolved_content is not None:
+            updated_content = resolved_content
+            logger.info(f"Successfully updated {section}")
         else:
-            logger.warning(f"Field {field_name} not found in content")
+            logger.warning(f"Field for section {section} not found in content")
             # Try direct mapping as fallback
             updated_content[section] = selected_output
 
@@ -287,64 +296,6 @@ def create_updated_content_from_selection(
         raise
 
 
-def handle_h2_section_update(
-    content: Dict[str, Any], section: str, selected_output: str
-) -> Dict[str, Any]:
-    """
-    Handle updates to H2 sections specifically
-
-    Args:
-        content: The original content
-        section: The H2 section identifier
-        selected_output: The new content for the section
-
-    Returns:
-        Updated content with H2 section modified
-    """
-    try:
-        # Parse the section identifier to find which H2 section and field
-        # Example: "H2 Section 1 Heading" or "H2 Section 2 Content"
-        if "h2_sections" not in content or not isinstance(content["h2_sections"], list):
-            logger.warning("No h2_sections found in content")
-            return content
-
-        # Extract section number and field type from section string
-        import re
-
-        match = re.search(r"H2.*?(\d+).*?(Heading|Content)", section)
-
-        if match:
-            section_index = int(match.group(1)) - 1  # Convert to 0-based index
-            field_type = match.group(2)
-
-            if 0 <= section_index < len(content["h2_sections"]):
-                h2_section = content["h2_sections"][section_index]
-
-                if field_type == "Heading":
-                    # Update heading
-                    if "H2 Heading" in h2_section:
-                        h2_section["H2 Heading"] = selected_output
-                    elif "H2_Heading" in h2_section:
-                        h2_section["H2_Heading"] = selected_output
-                elif field_type == "Content":
-                    # Update content
-                    if "H2 Content" in h2_section:
-                        h2_section["H2 Content"] = selected_output
-                    elif "H2_Content" in h2_section:
-                        h2_section["H2_Content"] = selected_output
-
-                logger.info(f"Updated H2 section {section_index + 1} {field_type}")
-            else:
-                logger.warning(f"H2 section index {section_index} out of range")
-        else:
-            logger.warning(f"Could not parse H2 section identifier: {section}")
-
-    except Exception as e:
-        logger.error(f"Error handling H2 section update: {str(e)}")
-
-    return content
-
-
 def validate_suggestion_structure(suggestions: List[Dict]) -> bool:
     """
     Validate that the suggestions have the expected structure
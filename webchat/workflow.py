@@ -9,12 +9,20 @@ from webchat.core.chains.guardrails_chains import (
     return_query_validator,
     return_guidelines_validator,
     return_query_validator_copyright,
+    return_combined_guardrails_validator,
 )
-from typing import Any, List, Dict
-from webchat.core.chains.core_chains import return_updated_wesite
+from typing import Any, AsyncIterator, List, Dict, Optional, Tuple
+from webchat.core.chains.core_chains import (
+    return_updated_wesite,
+    stream_updated_wesite,
+)
+from webchat.core.context import guidelines_context
+from webchat.core.metrics import REJECTED, stage_span
+from webchat.core.page_schema import apply_section_value
+from webchat.core.payload_log import log_payload
+from webchat.settings import SPECULATIVE_GENERATION, COMBINED_GUARDRAILS
 import asyncio
 import logging
-import json
 import os
 
 
@@ -65,68 +73,167 @@ def process_suggestions_response(response: List[Dict]) -> List[Dict]:
     return processed_suggestions
 
 
-async def get_updated_page_content_openai(
+def discard_task(task: asyncio.Task) -> None:
+    """Cancel a background task whose result is no longer needed"""
+    task.cancel()
+    # Retrieve the outcome so a task that already failed does not log "never retrieved"
+    task.add_done_callback(lambda t: t.cancelled() or t.exception())
+
+
+async def timed_guardrail(name: str, validator) -> Dict[str, Any]:
+    """Await one validator coroutine inside its own stage span"""
+    with stage_span(f"guardrail:{name}") as span:
+        result = await validator
+        if result.get("score") == 0:
+            span.outcome = REJECTED
+        return result
+
+
+async def first_rejection(validators: Dict[str, Any]) -> Optional[str]:
+    """
+    Await named validator coroutines as they complete and return the first rejection reason.
+
+    The remaining validators are cancelled as soon as one of them returns score 0, so a
+    rejected query costs the latency of a single validator. Returns None if all passed.
+    """
+    tasks = {
+        asyncio.create_task(timed_guardrail(name, coroutine)): name
+        for name, coroutine in validators.items()
+    }
+    pending = set(tasks)
+    try:
+        while pending:
+            done, pending = await asyncio.wait(
+                pending, return_when=asyncio.FIRST_COMPLETED
+            )
+            # Keep the declared validator order when several finish together
+            for task in [t for t in tasks if t in done]:
+                result = task.result()
+                if result.get("score") == 0:
+                    logger.warning(
+                        f"{tasks[task].capitalize()} validation failed: {result.get('reason')}"
+                    )
+                    return result.get("reason")
+        return None
+    finally:
+        for task in tasks:
+            if not task.done():
+                discard_task(task)
+            elif not task.cancelled():
+                # Retrieve failures of validators that finished alongside the deciding one
+                task.exception()
+
+
+async def run_guardrails(
     payload_data,
     model_output,
-    page_name,
+    main_output,
+    if_copyright,
     query,
-    text_to_change,
     section,
     all_pages_names,
-) -> Any:
+) -> Optional[str]:
     """
-    Enhanced function to handle both suggestion-based and direct update responses
+    Run the guardrail validators and return the rejection reason, or None if the query passed
     """
-    # Step 1: Extract relevant page info
-    main_output, left_panel, if_copyright, business_info = await extract_key_info(
-        payload_data, model_output, page_name
+    with stage_span("guardrails") as span:
+        rejection = await validate_query(
+            payload_data,
+            model_output,
+            main_output,
+            if_copyright,
+            query,
+            section,
+            all_pages_names,
+        )
+        if rejection is not None:
+            span.outcome = REJECTED
+        return rejection
+
+
+async def validate_query(
+    payload_data,
+    model_output,
+    main_output,
+    if_copyright,
+    query,
+    section,
+    all_pages_names,
+) -> Optional[str]:
+    """Body of run_guardrails: the rejection reason, or None"""
+    # The guidelines check sees the business info, this page's left panel and the
+    # section-scoped slice of this page rather than the whole site
+    payload_data, model_output = guidelines_context(
+        payload_data, model_output, main_output, section
     )
 
-    # Step 2: Run query validation
-    if if_copyright == "no":
-        # Run all validations concurrently
-        copyright_task, query_task, guidelines_task = await asyncio.gather(
-            return_query_validator_copyright(main_output, query),
-            return_query_validator(query),
-            return_guidelines_validator(
-                query, section, payload_data, model_output, all_pages_names
+    if COMBINED_GUARDRAILS:
+        # One call judges every check; the copyright check is only switched on for copy == "no"
+        verdict = await timed_guardrail(
+            "combined",
+            return_combined_guardrails_validator(
+                query,
+                section,
+                payload_data,
+                model_output,
+                all_pages_names,
+                current_output=main_output if if_copyright == "no" else None,
             ),
         )
-
-        if query_task.get("score") == 0:
-            logger.warning(f"Query validation failed: {query_task.get('reason')}")
-            return query_task.get("reason")
-        if copyright_task.get("score") == 0:
+        if verdict.get("score") == 0:
             logger.warning(
-                f"Copyright validation failed: {copyright_task.get('reason')}"
+                f"Combined guardrail validation failed: {verdict.get('reason')}"
             )
-            return copyright_task.get("reason")
-        if guidelines_task.get("score") == 0:
-            logger.warning(
-                f"Guidelines validation failed: {guidelines_task.get('reason')}"
-            )
-            return guidelines_task.get("reason")
+            return verdict.get("reason")
+        return None
 
-    else:
-        # Run query and guidelines validators concurrently
-        query_task, guidelines_task = await asyncio.gather(
-            return_query_validator(query),
-            return_guidelines_validator(
-                query, section, payload_data, model_output, all_pages_names
-            ),
-        )
+    validators = {"query": return_query_validator(query)}
+    if if_copyright == "no":
+        validators["copyright"] = return_query_validator_copyright(main_output, query)
+    validators["guidelines"] = return_guidelines_validator(
+        query, section, payload_data, model_output, all_pages_names
+    )
 
-        if query_task.get("score") == 0:
-            logger.warning(f"Query validation failed: {query_task.get('reason')}")
-            return query_task.get("reason")
-        if guidelines_task.get("score") == 0:
-            logger.warning(
-                f"Guidelines validation failed: {guidelines_task.get('reason')}"
-            )
-            return guidelines_task.get("reason")
+    return await first_rejection(validators)
 
-    # Step 3: Generate updated content
-    response = await return_updated_wesite(
+
+async def generate_update(generation_args) -> Any:
+    """return_updated_wesite timed as the generation stage"""
+    with stage_span("generation"):
+        return await return_updated_wesite(*generation_args)
+
+
+async def get_updated_page_content_openai(
+    payload_data,
+    model_output,
+    page_name,
+    query,
+    text_to_change,
+    section,
+    all_pages_names,
+    speculative: Optional[bool] = None,
+    precomputed_verdicts: Optional[Dict[str, Dict[str, Any]]] = None,
+) -> Any:
+    """
+    Enhanced function to handle both suggestion-based and direct update responses
+
+    With speculative=True the generation call starts at the same time as the guardrail
+    validators and is cancelled if any of them rejects the query. Defaults to
+    WEBCHAT_SPECULATIVE_GENERATION.
+
+    precomputed_verdicts holds offline guardrail verdicts for a preset action, keyed by the
+    page's copy value ("no" or "yes"). When one applies, the LLM validators are skipped.
+    """
+    if speculative is None:
+        speculative = SPECULATIVE_GENERATION
+
+    # Step 1: Extract relevant page info
+    with stage_span("extract_key_info"):
+        main_output, left_panel, if_copyright, business_info = await extract_key_info(
+            payload_data, model_output, page_name
+        )
+
+    generation_args = (
         business_info,
         left_panel,
         query,
@@ -136,19 +243,48 @@ async def get_updated_page_content_openai(
         section,
         all_pages_names,
     )
+    generation_task = None
+    if speculative:
+        generation_task = asyncio.create_task(generate_update(generation_args))
 
-    logger.info("=" * 60)
-    logger.info("OPENAI RESPONSE FROM return_updated_wesite:")
-    logger.info(f"Response type: {type(response)}")
+    # Step 2: Run query validation
+    precomputed = None
+    if precomputed_verdicts:
+        precomputed = precomputed_verdicts.get("no" if if_copyright == "no" else "yes")
 
-    try:
-        if isinstance(response, (dict, list)):
-            logger.info(json.dumps(response, indent=4, ensure_ascii=False))
-        else:
-            logger.info(f"Response (non-JSON): {response}")
-    except Exception as e:
-        logger.error(f"Could not serialize response for logging: {e}")
-        logger.info(f"Response (raw): {str(response)}")
+    if precomputed is not None:
+        logger.info("Using precomputed guardrail verdict for preset action")
+        rejection = None if precomputed.get("score") == 1 else precomputed.get("reason")
+    else:
+        try:
+            rejection = await run_guardrails(
+                payload_data,
+                model_output,
+                main_output,
+                if_copyright,
+                query,
+                section,
+                all_pages_names,
+            )
+        except BaseException:
+            if generation_task is not None:
+                discard_task(generation_task)
+            raise
+
+    if rejection is not None:
+        if generation_task is not None:
+            discard_task(generation_task)
+            logger.info("Speculative generation cancelled after guardrail rejection")
+        return rejection
+
+    # Step 3: Generate updated content
+    if generation_task is not None:
+        response = await generation_task
+    else:
+        response = await generate_update(generation_args)
+
+    logger.info(f"Response type: {type(response)}")
+    log_payload("OPENAI RESPONSE FROM return_updated_wesite", response)
 
     # Step 4: Handle the response based on its structure
     if isinstance(response, list) and len(response) > 0:
@@ -173,52 +309,24 @@ async def get_updated_page_content_openai(
             logger.info("Processing as direct update response (legacy format)")
 
             # This is the legacy direct update format - process as before
-            updated_content = process_response_updates(main_output, response, page_name)
-
-            logger.info("=" * 60)
-            logger.info("UPDATED CONTENT AFTER process_response_updates:")
-            try:
-                if isinstance(updated_content, (dict, list)):
-                    logger.info(
-                        json.dumps(updated_content, indent=4, ensure_ascii=False)
-                    )
-                else:
-                    logger.info(f"Updated content (non-JSON): {updated_content}")
-            except Exception as e:
-                logger.error(f"Could not serialize updated_content for logging: {e}")
-                logger.info(f"Updated content (raw): {str(updated_content)}")
-
-            cleaned_content = remove_none_values(updated_content)
-
-            logger.info("=" * 60)
-            logger.info("CLEANED CONTENT AFTER remove_none_values:")
-            try:
-                if isinstance(cleaned_content, (dict, list)):
-                    logger.info(
-                        json.dumps(cleaned_content, indent=4, ensure_ascii=False)
-                    )
-                else:
-                    logger.info(f"Cleaned content (non-JSON): {cleaned_content}")
-            except Exception as e:
-                logger.error(f"Could not serialize cleaned_content for logging: {e}")
-                logger.info(f"Cleaned content (raw): {str(cleaned_content)}")
+            with stage_span("process_response_updates"):
+                updated_content = process_response_updates(
+                    main_output, response, page_name
+                )
 
-            final_response = update_page_content(model_output, cleaned_content)
+            log_payload(
+                "UPDATED CONTENT AFTER process_response_updates", updated_content
+            )
 
-            logger.info("=" * 60)
-            logger.info("FINAL RESPONSE AFTER update_page_content:")
-            try:
-                if isinstance(final_response, (dict, list)):
-                    logger.info(
-                        json.dumps(final_response, indent=4, ensure_ascii=False)
-                    )
-                else:
-                    logger.info(f"Final response (non-JSON): {final_response}")
-            except Exception as e:
-                logger.error(f"Could not serialize final_response for logging: {e}")
-                logger.info(f"Final response (raw): {str(final_response)}")
+            with stage_span("remove_none_values"):
+                cleaned_content = remove_none_values(updated_content)
 
-            logger.info("=" * 60)
+            log_payload("CLEANED CONTENT AFTER remove_none_values", cleaned_content)
+
+            with stage_span("update_page_content"):
+                final_response = update_page_content(model_output, cleaned_content)
+
+            log_payload("FINAL RESPONSE AFTER update_page_content", final_response)
             return final_response
 
     elif isinstance(response, str):
@@ -230,6 +338,83 @@ async def get_updated_page_content_openai(
         return f"Unexpected response format: {type(response)}"
 
 
+async def stream_updated_page_content_openai(
+    payload_data,
+    model_output,
+    page_name,
+    query,
+    text_to_change,
+    section,
+    all_pages_names,
+    precomputed_verdicts: Optional[Dict[str, Dict[str, Any]]] = None,
+) -> AsyncIterator[Tuple[str, Any]]:
+    """
+    Streaming counterpart of get_updated_page_content_openai for the suggestions format.
+
+    Yields (event, data) pairs:
+    - ("rejected", reason) if a guardrail fails, and nothing after it
+    - ("guardrails", {"passed": True}) once the validators have passed
+    - ("suggestion", {"position": i, "text": ...}) as soon as each suggested output is complete
+    - ("complete", processed_suggestions) with the same list the non-streaming call returns
+    """
+    with stage_span("extract_key_info"):
+        main_output, left_panel, if_copyright, business_info = await extract_key_info(
+            payload_data, model_output, page_name
+        )
+
+    precomputed = None
+    if precomputed_verdicts:
+        precomputed = precomputed_verdicts.get("no" if if_copyright == "no" else "yes")
+    if precomputed is not None:
+        rejection = None if precomputed.get("score") == 1 else precomputed.get("reason")
+    else:
+        rejection = await run_guardrails(
+            payload_data,
+            model_output,
+            main_output,
+            if_copyright,
+            query,
+            section,
+            all_pages_names,
+        )
+    if rejection is not None:
+        yield "rejected", rejection
+        return
+    yield "guardrails", {"passed": True}
+
+    # A suggestion is complete once the parser has moved on to the next one; the last one
+    # is only complete when the stream ends
+    emitted = 0
+    final = {}
+    # Includes the time the client takes to consume each suggestion event
+    with stage_span("generation_stream"):
+        async for partial in stream_updated_wesite(
+            business_info,
+            left_panel,
+            query,
+            main_output,
+            page_name,
+            text_to_change,
+            section,
+            all_pages_names,
+        ):
+            final = partial
+            outputs = partial.get("outputs_list") or []
+            while emitted < len(outputs) - 1:
+                yield "suggestion", {"position": emitted, "text": outputs[emitted]}
+                emitted += 1
+
+    outputs = final.get("outputs_list") or []
+    while emitted < len(outputs):
+        yield "suggestion", {"position": emitted, "text": outputs[emitted]}
+        emitted += 1
+
+    processed_suggestions = process_suggestions_response([final])
+    for suggestion in processed_suggestions:
+        suggestion["original_text"] = text_to_change
+    yield "complete", processed_suggestions
+
+
 async def apply_suggestion_to_content(
     payload_data, model_output, page_name: str, selected_suggestion: Dict[str, Any]
 ) -> Any:
@@ -244,52 +429,30 @@ async def apply_suggestion_to_content(
         logger.info("=" * 60)
 
         # Extract the necessary information
-        main_output, left_panel, if_copyright, business_info = await extract_key_info(
-            payload_data, model_output, page_name
-        )
-
-        # Create a mock response structure that mimics the direct update format
-        # This allows us to reuse the existing processing pipeline
-        mock_response = [main_output.copy()]  # Start with the original content
+        with stage_span("extract_key_info"):
+            main_output, left_panel, if_copyright, business_info = await extract_key_info(
+                payload_data, model_output, page_name
+            )
 
-        # Update the specific section with the selected suggestion
         section = selected_suggestion.get("section", "")
         selected_output = selected_suggestion.get("selected_output", "")
 
-        # Map the section to the correct field in the content structure
-        section_field_mapping = {
-            "Meta Title": "Meta Title (30 to 60 Characters)",
-            "Meta Description": "Meta Description (70 to 143 Characters)",
-            "Hero Title": "Hero Title (20 to 70 Characters)",
-            "Hero Text": "Hero Text (50 to 100 Characters)",
-            "Hero CTA": "Hero CTA",
-            "H1": "H1 (30 to 70 Characters)",
-            "H1 Content": "H1 Content",
-            "Header": "Header",
-            "Leading Sentence": "Leading Sentence",
-            "CTA Button": "CTA Button",
-        }
-
-        # Get the correct field name
-        field_name = section_field_mapping.get(section, section)
-
-        # Apply the selected suggestion to the mock response
-        if field_name in mock_response[0]:
-            mock_response[0][field_name] = selected_output
-            logger.info(f"Applied suggestion to field: {field_name}")
+        # Resolve the section through the page schema and set it on a copy of the page
+        page = main_output[0]
+        with stage_span("apply_section_value"):
+            updated_page = apply_section_value(page, section, selected_output)
+        if updated_page is not None:
+            logger.info(f"Applied suggestion to section: {section}")
         else:
-            logger.warning(f"Field {field_name} not found in content structure")
-            # Try to handle H2 sections or other nested structures
-            if section.startswith("H2") and "h2_sections" in mock_response[0]:
-                # Handle H2 section updates - would need more specific logic
-                logger.info("H2 section update detected - may need specific handling")
-
-        # Process the mock response through the existing pipeline
-        updated_content = process_response_updates(
-            main_output, mock_response, page_name
-        )
+            logger.warning(
+                f"Field for section {section} not found in content structure"
+            )
+            updated_page = page
+
+        updated_content = [updated_page]
         cleaned_content = remove_none_values(updated_content)
-        final_response = update_page_content(model_output, cleaned_content)
+        with stage_span("update_page_content"):
+            final_response = update_page_content(model_output, cleaned_content)
 
         logger.info("=" * 60)
         logger.info("SUGGESTION APPLICATION COMPLETE:")